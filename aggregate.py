@@ -0,0 +1,159 @@
+"""
+In-memory aggregate of all the reports of a period. User fills it with the
+counters and every sink of sinks.py serializes it once.
+"""
+
+import importlib
+import logging
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
+from constants import BALLET, EXTRAS, FEAT, SECURE, PERFS, REHS, MEN, WOMEN
+
+# Counter columns of every person in the order of the reports
+COLUMNS = ((PERFS, FEAT), (PERFS, SECURE), (REHS, FEAT), (REHS, SECURE))
+
+# Event type and gender of every report table
+TABLES = tuple((event_type, gender) for event_type in (BALLET, EXTRAS) for gender in (MEN, WOMEN))
+
+# (event type, action type) -> event codes
+Listed = Dict[Tuple[str, str], Set[str]]
+
+
+def empty_listed() -> Listed:
+    """No codes of every event type and action type yet."""
+    return {(event_type, action_type): set() for event_type in (BALLET, EXTRAS) for action_type in (PERFS, REHS)}
+
+
+def normalize(name: str) -> str:
+    """Name, that doesn't depend on the case, whitespaces and ё/е."""
+    return ' '.join(name.replace('ё', 'е').replace('Ё', 'Е').split()).casefold()
+
+
+class StaffIndex:
+    def __init__(self, staff: Dict[Tuple[str, str], List[str]]):
+        """
+        Args:
+            staff: (event type, gender) -> names of the staff list
+        """
+        # Names of the rows of every table and their normalized names
+        self.names: Dict[Tuple[str, str], List[str]] = {}
+        self.keys: Dict[Tuple[str, str], List[str]] = {}
+        for table, names in staff.items():
+            unique = {}
+            for name in names:
+                unique.setdefault(normalize(name), name)
+            self.keys[table], self.names[table] = list(unique), list(unique.values())
+
+        self.known: Set[str] = {key for keys in self.keys.values() for key in keys}
+
+    @classmethod
+    def load(cls) -> 'StaffIndex':
+        """Builds the index from the lists of the staff.staff module."""
+        module = importlib.import_module('staff.staff')
+        return cls({table: getattr(module, '_'.join(table)) for table in TABLES})
+
+
+@lru_cache
+def get_staff() -> StaffIndex:
+    """The staff index is built once per run."""
+    return StaffIndex.load()
+
+
+class Aggregate:
+    def __init__(self, staff: StaffIndex = None):
+        """
+        Args:
+            staff: index of the staff lists. The staff.staff module if None.
+        """
+        # event type -> name -> 4 counters in the order of COLUMNS
+        self.counters: Dict[str, Dict[str, List[int]]] = {BALLET: {}, EXTRAS: {}}
+        self.__staff = staff
+        self.__matrices: Dict[str, Tuple[Dict[str, int], array]] = {}
+        self.__rows: Dict[Tuple[str, str], List[List]] = {}
+
+    @property
+    def staff(self) -> StaffIndex:
+        if self.__staff is None:
+            self.__staff = get_staff()
+        return self.__staff
+
+    def add(self, event_type: str, action_type: str, feat: Dict[str, int], secure: Dict[str, int]) -> None:
+        """
+        Adds feature and secure participant names with counters of a report.
+        Empty names are skipped.
+        """
+        self.__matrices.clear()
+        self.__rows.clear()
+        counters = self.counters[event_type]
+        for participation_type, table in zip((FEAT, SECURE), (feat, secure)):
+            column = COLUMNS.index((action_type, participation_type))
+            for person, counter in table.items():
+                if person:
+                    counters.setdefault(person, [0, 0, 0, 0])[column] += counter
+
+    def table(self, event_type: str, action_type: str, participation_type: str) -> Dict[str, int]:
+        """
+        Returns:
+            Participant names with counters of one column: {name: events' counter}
+        """
+        column = COLUMNS.index((action_type, participation_type))
+        return {
+            person: counters[column] for person, counters in self.counters[event_type].items() if counters[column]
+        }
+
+    def __matrix(self, event_type: str) -> Tuple[Dict[str, int], array]:
+        """
+        Packs the counters of the event type into a flat array with 4 columns
+        per person. Names, that differ only by case, whitespaces or ё/е, share
+        the row. Reports names, that are in none of the staff lists.
+        Returns:
+            Normalized name -> row index and the array.
+        """
+        if event_type not in self.__matrices:
+            row_index, matrix = {}, array('l')
+            for person, counters in self.counters[event_type].items():
+                row = row_index.setdefault(normalize(person), len(row_index))
+                if row * 4 == len(matrix):
+                    matrix.extend(counters)
+                else:
+                    for column, counter in enumerate(counters):
+                        matrix[row * 4 + column] += counter
+            self.__matrices[event_type] = row_index, matrix
+
+            unmatched = self.unmatched(event_type)
+            if unmatched:
+                logging.warning(f'{event_type}: {len(unmatched)} names are not in the staff: {", ".join(unmatched)}')
+
+        return self.__matrices[event_type]
+
+    def unmatched(self, event_type: str) -> List[str]:
+        """
+        Returns:
+            Names with counters, that are in none of the staff lists.
+        """
+        return sorted(person for person in self.counters[event_type] if normalize(person) not in self.staff.known)
+
+    def rows(self, event_type: str, gender: str) -> List[List]:
+        """
+        Gathers 4 counters for every name from a staff list. Names without
+        any participation are skipped. Rows are computed once for all the
+        sinks.
+        Returns:
+            Rows with values ('C' - counter; sorted by perf feat C):
+            Name, perf feat C, perf secure C, reh feat C, reh secure C
+        """
+        table = (event_type, gender)
+        if table not in self.__rows:
+            row_index, matrix = self.__matrix(event_type)
+            rows = []
+            for name, key in zip(self.staff.names[table], self.staff.keys[table]):
+                row = row_index.get(key)
+                if row is not None:
+                    rows.append([name, *matrix[row * 4:row * 4 + 4]])
+            self.__rows[table] = [
+                row for row in sorted(rows, key=lambda x: x[1:], reverse=True) if any(row[1:])
+            ]
+
+        return self.__rows[table]
@@ -0,0 +1,55 @@
+"""
+Batch mode: reports for a range of months. Every month is processed in its
+own worker process with its own codes, csv, xls and db table. All the
+periods share one login and the page cache.
+Usage:
+    python batch.py 09.2023 06.2024 [--processes N]
+"""
+
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+from config import PROCESSES, RATE, RATE_MIN, RATE_MAX
+from period import Period
+from pipeline import CodesMissing, run_period
+from ratelimit import RateLimiter
+from transport import Transport
+
+
+def run_worker(period: Period, state: Dict, processes: int) -> Dict[str, float]:
+    """
+    Runs the period in a worker process on the login of the main process.
+    The workers share the rate limit of config equally.
+    Returns:
+        Connection stats of the worker.
+    """
+    limiter = RateLimiter(RATE / processes, RATE_MIN / processes, RATE_MAX / processes)
+    transport = Transport(state=state, limiter=limiter)
+    run_period(period, transport)
+
+    return transport.stats()
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('start', help='first month, MM.YYYY')
+    arg_parser.add_argument('final', help='last month, MM.YYYY')
+    arg_parser.add_argument('--processes', type=int, default=PROCESSES, help='periods processed at once')
+    args = arg_parser.parse_args()
+
+    periods = Period.months(args.start, args.final)
+    state = Transport().state()
+    processes = min(args.processes, len(periods))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {period: executor.submit(run_worker, period, state, processes) for period in periods}
+        for period, future in futures.items():
+            try:
+                logging.info(f'{period.dates} done. Connections: {future.result()}')
+            except CodesMissing as error:
+                logging.error(f'{error}')
+
+
+if __name__ == '__main__':
+    main()
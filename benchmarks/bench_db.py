@@ -0,0 +1,68 @@
+"""
+Benchmark of the database writes: a commit per row, as Data.write_to_db did
+before, against db.upsert_books in one transaction.
+Usage:
+    python -m benchmarks.bench_db [--url URL] [--rows N]
+Uses a temporary SQLite database by default. Pass --url of a local
+PostgreSQL to measure the real thing.
+"""
+
+import argparse
+import tempfile
+import time
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+
+from benchmarks.fixtures import names
+from db.db import Base, Book, COUNTERS, upsert_books
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--url', help='database url, temporary SQLite if not set')
+    arg_parser.add_argument('--rows', type=int, default=560, help='number of rows of all 4 reports')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(args.url or f'sqlite:///{directory}/bench.sqlite3')
+        Base.metadata.create_all(engine)
+        artists = names(True) + names(False)
+        rows = [
+            {'name': f'{artists[i % len(artists)]} {i // len(artists)}',
+             **{counter: (i * 7 + j) % 30 for j, counter in enumerate(COUNTERS)}}
+            for i in range(args.rows)
+        ]
+        with engine.begin() as connection:
+            connection.execute(delete(Book))
+
+        start = time.perf_counter()
+        with Session(engine) as session:
+            for row in rows:
+                session.add(Book(**row))
+                session.commit()
+        per_row = time.perf_counter() - start
+
+        with engine.begin() as connection:
+            connection.execute(delete(Book))
+
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            upsert_books(connection, rows)
+        bulk = time.perf_counter() - start
+
+        # The same period again updates the rows instead of failing
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            upsert_books(connection, rows)
+        rerun = time.perf_counter() - start
+        engine.dispose()
+
+    print(f'{len(rows)} rows, {engine.dialect.name}')
+    print(f'{"commit per row":<18}{per_row * 1000:>10.1f} ms')
+    print(f'{"bulk upsert":<18}{bulk * 1000:>10.1f} ms  x{per_row / bulk:.0f}')
+    print(f'{"bulk upsert again":<18}{rerun * 1000:>10.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
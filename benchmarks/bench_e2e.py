@@ -0,0 +1,138 @@
+"""
+End-to-end benchmark of the main.py flow against benchmarks.portal: login,
+discovery and fetching, csv, xls and db outputs. Reports events per second,
+wall time of every stage from the metrics of the run and peak memory. The first run starts with an
+empty page cache and manifest, the next ones reuse them.
+Usage:
+    python -m benchmarks.bench_e2e [--events N] [--latency MS] [--failure-rate R] [--runs N] ...
+The run happens in a temporary directory with a staff list of the
+synthetic names and a temporary SQLite database.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+from benchmarks.fixtures import names
+from benchmarks.portal import LOGIN_PATH, EVENT_PATH
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_portal(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    """
+    Starts the portal in a separate process, so it doesn't count in the
+    memory and the CPU time of the run.
+    Returns:
+        Process and url of the portal.
+    """
+    command = [
+        sys.executable, '-m', 'benchmarks.portal', '--port', '0', '--events', str(args.events),
+        '--rows', str(args.rows), '--latency', str(args.latency), '--jitter', str(args.jitter),
+        '--failure-rate', str(args.failure_rate), '--expire-after', str(args.expire_after)
+    ]
+    if args.pages:
+        command += ['--pages', os.path.abspath(args.pages)]
+    process = subprocess.Popen(command, cwd=REPO_PATH, stdout=subprocess.PIPE, text=True)
+    login_url = process.stdout.readline().split()[-1]
+
+    return process, login_url[:-len(LOGIN_PATH)]
+
+
+def write_staff(directory: str) -> None:
+    """Staff lists of the synthetic names of benchmarks.fixtures."""
+    os.makedirs(f'{directory}/staff')
+    open(f'{directory}/staff/__init__.py', 'w').close()
+    with open(f'{directory}/staff/staff.py', 'w', encoding='utf-8') as file:
+        for event_type in ('ballet', 'extras'):
+            file.write(f'{event_type}_men = {names(True)!r}\n')
+            file.write(f'{event_type}_women = {names(False)!r}\n')
+
+
+def peak_memory() -> float:
+    """Peak resident memory of the process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def run(database_url: str) -> float:
+    """
+    The flow of main.py: login and pipeline.run_period, that times its
+    stages in the metrics of the run.
+    Returns:
+        Wall time of the run, sec.
+    """
+    from constants import PERIOD
+    from pipeline import run_period
+    from transport import Transport
+
+    start = time.perf_counter()
+    run_period(PERIOD, Transport(), database_url)
+
+    return time.perf_counter() - start
+
+
+def report(number: int, seconds: float) -> None:
+    """
+    Stages of the run from the metrics, that run_period wrote, and the summed
+    time of the calls, e.g. of all the fetches.
+    """
+    from constants import PERIOD
+
+    with open(PERIOD.metrics_path, encoding='utf-8') as file:
+        metrics = json.load(file)
+
+    pages, pipeline = metrics['counters'].get('pages', 0), metrics['stages']['pipeline']['sum']
+    print(f'Run {number}: {pages} event pages, {pages / pipeline:.1f} events/s, {seconds:.2f} s total, '
+          f'{peak_memory():.1f} MB peak')
+    for name, histogram in metrics['stages'].items():
+        print(f'  {name:<18}{histogram["sum"] * 1000:>10.1f} ms in {histogram["count"]} calls, '
+              f'p95 {histogram["p95"] * 1000:.1f} ms')
+    print('  ' + ', '.join(f'{counter} {value}' for counter, value in metrics['counters'].items()))
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--events', type=int, default=50, help='events of every department')
+    arg_parser.add_argument('--rows', type=int, default=40, help='roles of a synthetic event')
+    arg_parser.add_argument('--latency', type=float, default=20, help='mean delay of a response, ms')
+    arg_parser.add_argument('--jitter', type=float, default=10, help='max deviation of the delay, ms')
+    arg_parser.add_argument('--failure-rate', type=float, default=0.02, help='share of event pages answered with 503')
+    arg_parser.add_argument('--expire-after', type=int, default=0, help='event pages served by one session')
+    arg_parser.add_argument('--pages', help='directory with recorded event pages, see benchmarks.portal')
+    arg_parser.add_argument('--runs', type=int, default=2, help='runs on the same cache and manifest')
+    args = arg_parser.parse_args()
+
+    process, url = start_portal(args)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ.update({
+                'username': 'bench', 'password': 'bench',
+                'url_login': url + LOGIN_PATH, 'url_event': url + EVENT_PATH
+            })
+            # Outputs and the cache go to the temporary directory, the
+            # staff list of the synthetic names shadows the real one
+            write_staff(directory)
+            os.symlink(f'{REPO_PATH}/templates', f'{directory}/templates')
+            os.chdir(directory)
+            sys.path.insert(0, directory)
+            importlib.invalidate_caches()
+
+            print(f'Portal {url}: {args.events} events per department, latency {args.latency} ± {args.jitter} ms, '
+                  f'failure rate {args.failure_rate}')
+            for number in range(1, args.runs + 1):
+                report(number, run(f'sqlite:///{directory}/bench.sqlite3'))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    main()
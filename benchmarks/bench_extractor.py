@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the participants table extraction: the full
+BeautifulSoup parse against extractor.extract_rows.
+Usage:
+    python -m benchmarks.bench_extractor [--cache PATH] [--pages N]
+Takes saved pages from the page cache, if it exists. Otherwise uses
+synthetic pages from benchmarks.fixtures.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+import tracemalloc
+import zlib
+from typing import Callable, List, Tuple
+
+import bs4
+
+from benchmarks.fixtures import event_page
+from extractor import STYLE_TAG, extract_rows
+
+
+def soup_rows(page: str) -> List[Tuple[str, str, str]]:
+    """The full parse, as User did it before extract_rows."""
+    cells = [td.text.strip() for td in bs4.BeautifulSoup(page, 'lxml').find_all('td', style=STYLE_TAG)]
+    return list(zip(cells[0::3], cells[1::3], cells[2::3]))
+
+
+def load_pages(cache_path: str, number: int) -> List[str]:
+    if os.path.isfile(cache_path):
+        with sqlite3.connect(cache_path) as connection:
+            rows = connection.execute('SELECT page FROM pages LIMIT ?', (number,)).fetchall()
+        if rows:
+            return [zlib.decompress(row[0]).decode('utf-8') for row in rows]
+
+    return [event_page(str(code)) for code in range(number)]
+
+
+def measure(extract: Callable, pages: List[str]) -> Tuple[float, float]:
+    """
+    Returns:
+        Mean time, ms, and mean peak of allocated memory, KiB, per page.
+    """
+    start = time.perf_counter()
+    for page in pages:
+        extract(page)
+    elapsed = time.perf_counter() - start
+
+    peak = 0
+    for page in pages:
+        tracemalloc.start()
+        extract(page)
+        peak += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return elapsed / len(pages) * 1000, peak / len(pages) / 1024
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--cache', default='./data/cache.sqlite3', help='page cache with saved pages')
+    arg_parser.add_argument('--pages', type=int, default=200, help='number of pages')
+    args = arg_parser.parse_args()
+
+    pages = load_pages(args.cache, args.pages)
+    for page in pages:
+        assert extract_rows(page) == soup_rows(page), 'extractors disagree'
+
+    soup_time, soup_memory = measure(soup_rows, pages)
+    rows_time, rows_memory = measure(extract_rows, pages)
+    print(f'{len(pages)} pages, {sum(map(len, pages)) // len(pages)} chars per page')
+    print(f'{"":<14}{"ms/page":>10}{"KiB/page":>12}')
+    print(f'{"BeautifulSoup":<14}{soup_time:>10.2f}{soup_memory:>12.1f}')
+    print(f'{"extract_rows":<14}{rows_time:>10.2f}{rows_memory:>12.1f}')
+    print(f'speedup x{soup_time / rows_time:.1f}, memory x{soup_memory / rows_memory:.1f} less')
+
+
+if __name__ == '__main__':
+    main()
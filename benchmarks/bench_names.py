@@ -0,0 +1,103 @@
+"""
+Micro-benchmark of the participants distribution: the skip list checked
+substring by substring and the brackets removed char by char, as User did
+before, against the compiled SKIP_ROLES_PATTERN and the cached
+utils.remove_brackets.
+Usage:
+    python -m benchmarks.bench_names [--cache PATH] [--pages N] [--repeat N]
+Takes saved pages from the page cache, if it exists. Otherwise uses
+synthetic pages from benchmarks.fixtures.
+"""
+
+import argparse
+import time
+from typing import Callable, List, Set, Tuple
+
+from benchmarks.bench_extractor import load_pages
+from constants import CACHE_PATH
+from extractor import extract_rows
+from parser import User
+from utils import remove_brackets
+
+Table = List[Tuple[str, str, str]]
+
+
+def remove_brackets_per_char(text: str) -> str:
+    """The previous utils.remove_brackets."""
+    if any(bracket in ('(', ')') for bracket in text):
+        ret = ''
+        skip1c = 0
+        skip2c = 0
+        for char in text:
+            if char == '(':
+                skip2c += 1
+            elif char == ')' and skip2c > 0:
+                skip2c -= 1
+            elif skip1c == 0 and skip2c == 0:
+                ret += char
+        return ret.strip()
+    return text.strip()
+
+
+def distribute_per_substring(table: Table) -> Tuple[Set[str], Set[str]]:
+    """The previous User.__distribute_participants."""
+    feat, secure = set(), set()
+    skip_part = {
+        'режиссер', 'режисер', 'миманс', 'педагог', 'инспектор',
+        'концермейстер', 'концертмейстер', 'руководитель балетной труппы'
+    }
+
+    for role, feat_column, secure_column in table:
+        if not any(part in role.lower() for part in skip_part):
+
+            for person in feat_column.split(','):
+                feat.add(remove_brackets_per_char(person))
+
+            for person in secure_column.split(','):
+                secure.add(remove_brackets_per_char(person))
+
+    return feat, secure
+
+
+def measure(distribute: Callable, tables: List[Table], repeat: int) -> float:
+    """
+    Returns:
+        Mean time of an event, sec.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for table in tables:
+            distribute(table)
+
+    return (time.perf_counter() - start) / (repeat * len(tables))
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--cache', default=CACHE_PATH, help='page cache to take the pages from')
+    arg_parser.add_argument('--pages', type=int, default=200, help='number of events')
+    arg_parser.add_argument('--repeat', type=int, default=20, help='passes over all the events')
+    args = arg_parser.parse_args()
+
+    tables = [extract_rows(page) for page in load_pages(args.cache, args.pages)]
+    distribute = User._User__distribute_participants
+    for table in tables:
+        if distribute_per_substring(table) != distribute(table):
+            raise AssertionError('Participants differ from the previous distribution')
+
+    per_substring = measure(distribute_per_substring, tables, args.repeat)
+    # The first pass fills the cache of the names, like the first events of a run
+    remove_brackets.cache_clear()
+    first_pass = measure(distribute, tables, 1)
+    compiled = measure(distribute, tables, args.repeat)
+
+    rows = sum(map(len, tables)) / len(tables)
+    print(f'{len(tables)} events, {rows:.0f} rows per event, cache {remove_brackets.cache_info()}')
+    print(f'{"per substring":<18}{per_substring * 1e6:>10.1f} us/event')
+    print(f'{"compiled, 1st pass":<18}{first_pass * 1e6:>10.1f} us/event  x{per_substring / first_pass:.1f}')
+    print(f'{"compiled, cached":<18}{compiled * 1e6:>10.1f} us/event  x{per_substring / compiled:.1f}, '
+          f'{(per_substring - compiled) * 1e6:.1f} us/event saved')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark of the cross-month queries: the history of a name as a UNION of
+the tables of the periods, as it had to be done before, against the
+reports table, and the totals and the top of the reports table.
+Usage:
+    python -m benchmarks.bench_reports [--url URL] [--seasons N] [--repeat N]
+Fills a temporary SQLite database by default with the synthetic names of
+benchmarks.fixtures in every report of every month.
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from typing import Callable
+
+from sqlalchemy import create_engine, select, union_all
+
+from aggregate import TABLES, StaffIndex
+from benchmarks.fixtures import names
+from constants import MEN
+from db.db import Base, COUNTERS, get_table, replace_reports, upsert_books
+from db.reports import history, migrate_months, top, totals
+
+
+def measure(query: Callable, repeat: int) -> float:
+    """
+    Returns:
+        Mean time of the query, sec.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        query()
+
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--url', help='database url, temporary SQLite if not set')
+    arg_parser.add_argument('--seasons', type=int, default=5, help='years of monthly reports')
+    arg_parser.add_argument('--repeat', type=int, default=20, help='runs of every query')
+    args = arg_parser.parse_args()
+
+    rand = random.Random(0)
+    periods = [(2020 + month // 12, month % 12 + 1) for month in range(args.seasons * 12)]
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(args.url or f'sqlite:///{directory}/bench.sqlite3')
+        tables = [get_table(f'{year}_{month}') for year, month in periods]
+        Base.metadata.create_all(engine)
+
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            for table, (year, month) in zip(tables, periods):
+                reports = {
+                    report: [
+                        {'name': name, **{counter: rand.randint(0, 30) for counter in COUNTERS}}
+                        for name in names(report[1] == MEN)
+                    ]
+                    for report in TABLES
+                }
+                replace_reports(connection, f'{year}-{month:02}', reports)
+                # The same name is in the ballet and the extras reports, as DbSink
+                # did, the table of the period keeps the last one
+                books = {row['name']: row for rows in reports.values() for row in rows}
+                upsert_books(connection, list(books.values()), table)
+        fill = time.perf_counter() - start
+
+        name = names()[0]
+        union = union_all(*(select(table).where(table.c.name == name) for table in tables))
+        with engine.connect() as connection:
+            queries = {
+                'history, union': lambda: connection.execute(union).all(),
+                'history': lambda: history(connection, name),
+                'history, season': lambda: history(connection, name, '2021-09', '2022-06'),
+                'totals': lambda: totals(connection),
+                'top 10': lambda: top(connection, 10),
+                'top 10, season': lambda: top(connection, 10, 'perfs', '2021-09', '2022-06', 'ballet')
+            }
+            if len(history(connection, name)) != len(connection.execute(union).all()) * 2:
+                raise AssertionError('History differs from the tables of the periods')
+            timings = {query: measure(queries[query], args.repeat) for query in queries}
+
+        with engine.begin() as connection:
+            start = time.perf_counter()
+            staff = StaffIndex({report: names(report[1] == MEN) for report in TABLES})
+            migrated = migrate_months(connection, staff, overwrite=True)
+            migration = time.perf_counter() - start
+        engine.dispose()
+
+    rows = len(periods) * sum(len(names(gender == MEN)) for _, gender in TABLES)
+    print(f'{len(periods)} months, {rows} rows, {engine.dialect.name}, filled in {fill:.1f} s')
+    for query, seconds in timings.items():
+        print(f'{query:<18}{seconds * 1000:>10.2f} ms')
+    print(f'{"migrate":<18}{migration * 1000:>10.1f} ms  {migrated}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Cold start of every cli.py subcommand: wall time of a fresh process, time
+of its imports and the heavy dependencies, it loads. The baseline imports
+all the modules, as importing parser did before the imports were lazy.
+Usage:
+    python -m benchmarks.bench_startup [--events N]
+discover and fetch run against benchmarks.portal, the others on their
+outputs in a temporary directory.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Set, Tuple
+
+from benchmarks.bench_e2e import REPO_PATH, start_portal, write_staff
+from benchmarks.portal import LOGIN_PATH, EVENT_PATH
+
+HEAVY = ('requests', 'lxml.html', 'selenium', 'openpyxl', 'sqlalchemy', 'sqlalchemy_utils', 'tqdm')
+
+BASELINE = 'import driver, pipeline, transport, openpyxl, db.db, sqlalchemy_utils'
+
+
+def import_times(stderr: str) -> Tuple[float, Set[str]]:
+    """
+    Parses the output of -X importtime.
+    Returns:
+        Summed time of the top level imports, sec, and loaded modules.
+    """
+    total, modules = 0, set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules.add(name.strip())
+        if len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative)
+
+    return total / 1e6, modules
+
+
+def measure(command: List[str], env: dict, cwd: str) -> Tuple[float, float, Set[str]]:
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', *command], env=env, cwd=cwd,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if process.returncode:
+        raise RuntimeError(f'{command} failed:\n{process.stderr[-2000:]}')
+
+    return (wall, *import_times(process.stderr))
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--events', type=int, default=10, help='events of every department')
+    args = arg_parser.parse_args()
+
+    portal_args = argparse.Namespace(events=args.events, rows=40, latency=0, jitter=0, failure_rate=0,
+                                     expire_after=0, pages=None)
+    process, url = start_portal(portal_args)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            write_staff(directory)
+            os.symlink(f'{REPO_PATH}/templates', f'{directory}/templates')
+            env = {
+                **os.environ, 'PYTHONPATH': os.pathsep.join((directory, REPO_PATH)),
+                'username': 'bench', 'password': 'bench',
+                'url_login': url + LOGIN_PATH, 'url_event': url + EVENT_PATH
+            }
+            cli = f'{REPO_PATH}/cli.py'
+            commands = [
+                ('baseline imports', ['-c', BASELINE]),
+                ('discover', [cli, 'discover']),
+                ('fetch', [cli, 'fetch']),
+                ('aggregate', [cli, 'aggregate']),
+                ('export-xls', [cli, 'export-xls']),
+                ('export-db', [cli, 'export-db', '--url', f'sqlite:///{directory}/bench.sqlite3'])
+            ]
+
+            print(f'{"":<18}{"wall":>10}{"imports":>10}  heavy modules')
+            for name, command in commands:
+                wall, imports, modules = measure(command, env, directory)
+                heavy = ', '.join(module for module in HEAVY if module in modules) or '-'
+                print(f'{name:<18}{wall * 1000:>8.0f}ms{imports * 1000:>8.0f}ms  {heavy}')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark of the xls reports: loading the template and writing cell by
+cell for every report through openpyxl, as Data.write_to_xls did before,
+against XlsSink, that reads the template once and formats the rows of
+every report straight into the xlsx parts of the template.
+Usage:
+    python -m benchmarks.bench_xls [--rows N] [--reports N] [--repeat N]
+The writers take turns, the best round of each is printed.
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from typing import Callable
+
+import openpyxl
+
+from aggregate import TABLES
+from constants import WORKBOOK_PATH
+from period import Period
+from sinks import XlsSink
+
+
+def write_per_cell(period: Period, rows: list, file_name: str) -> None:
+    """The previous writer: a fresh template and a cell at a time."""
+    workbook = openpyxl.load_workbook(WORKBOOK_PATH)
+    worksheet = workbook.active
+    worksheet.cell(1, 1).value = period.dates
+    for row_index, row in enumerate(rows, start=11):
+        for col_index, value in enumerate(row, start=1):
+            worksheet.cell(row_index, col_index).value = str(value)
+    workbook.save(filename=f'{period.xls_path}{file_name}.xlsx')
+
+
+def measure(write: Callable, tables: list) -> float:
+    """
+    Returns:
+        Mean time of a report, sec.
+    """
+    start = time.perf_counter()
+    for event_type, gender in tables:
+        write(event_type, gender)
+
+    return (time.perf_counter() - start) / len(tables)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--rows', type=int, default=3000, help='rows per report')
+    arg_parser.add_argument('--reports', type=int, default=4, help='number of reports')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='rounds of every writer')
+    args = arg_parser.parse_args()
+
+    rand = random.Random(0)
+    rows = [[f'Артист {i}', *(rand.randint(0, 30) for _ in range(4))] for i in range(args.rows)]
+    tables = [TABLES[i % len(TABLES)] for i in range(args.reports)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        period = Period('01.09.2023', '30.09.2023')
+        period.xls_path = f'{directory}/'
+
+        per_cell, template = float('inf'), float('inf')
+        for _ in range(args.repeat):
+            per_cell = min(per_cell, measure(
+                lambda event_type, gender: write_per_cell(period, rows, f'{event_type}_{gender}'), tables
+            ))
+            # A new sink reads the template in the round as well
+            sink = XlsSink(period)
+            template = min(template, measure(
+                lambda event_type, gender: sink.write_table(event_type, gender, rows), tables
+            ))
+
+    print(f'{args.reports} reports, {args.rows} rows per report')
+    print(f'{"template per report":<22}{per_cell * 1000:>10.1f} ms/report')
+    print(f'{"XlsSink":<22}{template * 1000:>10.1f} ms/report  x{per_cell / template:.1f}')
+
+
+if __name__ == '__main__':
+    main()
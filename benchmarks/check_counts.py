@@ -0,0 +1,198 @@
+"""
+Check of the counts of the concurrent pipeline against the serial run, that
+parser.User did before the pipeline: every code of the code files fetched
+one by one, the whole page parsed with BeautifulSoup, and the participants
+counted by count_ballet and count_extras. Both runs go to benchmarks.portal.
+Usage:
+    python -m benchmarks.check_counts [--events N] [--workers N] [--failure-rate R] ...
+Exits with 1 and prints the differences, if any counter differs.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+from typing import Dict, List, Set, Tuple
+
+import bs4
+
+from benchmarks.bench_e2e import start_portal
+from benchmarks.portal import LOGIN_PATH, EVENT_PATH
+from extractor import STYLE_TAG
+
+# The modules of the repo, that read the config, are imported by the
+# functions, after the config of the portal is set.
+# Roles of the serial run, that weren't counted
+SKIP_PART = {
+    'режиссер', 'режисер', 'миманс', 'педагог', 'инспектор',
+    'концермейстер', 'концертмейстер', 'руководитель балетной труппы'
+}
+
+Counters = Tuple[Dict[str, int], Dict[str, int]]
+
+
+def remove_brackets(text: str) -> str:
+    """Remove brackets and text inside, as the serial run did."""
+    if any(bracket in ('(', ')') for bracket in text):
+        ret = ''
+        skip = 0
+        for char in text:
+            if char == '(':
+                skip += 1
+            elif char == ')' and skip > 0:
+                skip -= 1
+            elif skip == 0:
+                ret += char
+        return ret.strip()
+    return text.strip()
+
+
+class SerialCounter:
+    def __init__(self, transport, url_event: str):
+        """
+        Args:
+            transport: logged in transport. It retries the failures of the
+                portal, the serial run didn't.
+            url_event: url of the event pages
+        """
+        self.transport = transport
+        self.url_event = url_event
+
+    def __count_participants(self, event_type: str, event_code: str, feat: Set, secure: Set) -> None:
+        from parser import PAGE_CODES
+
+        page = self.transport.post(self.url_event + event_code + PAGE_CODES[event_type]).text
+        # The cells of the table go as Role | Feature | Secure
+        table = [td.text.strip() for td in bs4.BeautifulSoup(page, 'lxml').find_all('td', style=STYLE_TAG)]
+        for i in range(0, len(table), 3):
+            if not any(part in table[i].lower() for part in SKIP_PART):
+                feat.update(remove_brackets(person) for person in table[i + 1].split(','))
+                secure.update(remove_brackets(person) for person in table[i + 2].split(','))
+
+    @staticmethod
+    def __overflow_participants(feat: Set, secure: Set, events_feat: Dict, events_secure: Dict) -> None:
+        secure.difference_update(feat)
+        for person in feat:
+            events_feat[person] = events_feat.get(person, 0) + 1
+        for person in secure:
+            events_secure[person] = events_secure.get(person, 0) + 1
+
+    def count_ballet(self, ballet_codes: Set, extras_codes: Set) -> Counters:
+        """Both ballet and extras pages of every code."""
+        from constants import BALLET, EXTRAS
+
+        feats, secures = {}, {}
+        for event_code in ballet_codes.union(extras_codes):
+            feat, secure = set(), set()
+            for codes, event_type in zip((ballet_codes, extras_codes), (BALLET, EXTRAS)):
+                if event_code in codes:
+                    self.__count_participants(event_type, event_code, feat, secure)
+            self.__overflow_participants(feat, secure, feats, secures)
+
+        return feats, secures
+
+    def count_extras(self, extras_codes: Set) -> Counters:
+        """Only extras pages."""
+        from constants import EXTRAS
+
+        feats, secures = {}, {}
+        for event_code in extras_codes:
+            feat, secure = set(), set()
+            self.__count_participants(EXTRAS, event_code, feat, secure)
+            self.__overflow_participants(feat, secure, feats, secures)
+
+        return feats, secures
+
+    def run(self, codes_path: str) -> Dict[Tuple[str, str, str], Dict[str, int]]:
+        """
+        Counts every report from the code files. Empty names are dropped,
+        as the serial run did before it wrote the reports.
+        Returns:
+            (event type, action type, participation type) -> name -> counter
+        """
+        from constants import BALLET, EXTRAS, FEAT, SECURE, PERFS, REHS
+
+        counts = {}
+        for action_type in (PERFS, REHS):
+            codes = {}
+            for event_type in (BALLET, EXTRAS):
+                with open(f'{codes_path}{event_type}_{action_type}') as file:
+                    codes[event_type] = set(file.read().split())
+
+            for event_type, tables in (
+                (BALLET, self.count_ballet(codes[BALLET], codes[EXTRAS])),
+                (EXTRAS, self.count_extras(codes[EXTRAS]))
+            ):
+                for participation_type, table in zip((FEAT, SECURE), tables):
+                    table.pop('', None)
+                    counts[(event_type, action_type, participation_type)] = table
+
+        return counts
+
+
+def differences(expected: Dict[str, int], actual: Dict[str, int]) -> List[str]:
+    return [
+        f'{person}: {expected.get(person)} serial, {actual.get(person)} pipeline'
+        for person in sorted(expected.keys() | actual.keys()) if expected.get(person) != actual.get(person)
+    ]
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--events', type=int, default=50, help='events of every department')
+    arg_parser.add_argument('--rows', type=int, default=40, help='roles of a synthetic event')
+    arg_parser.add_argument('--workers', type=int, default=8, help='pages fetched at once by the pipeline')
+    arg_parser.add_argument('--latency', type=float, default=5, help='mean delay of a response, ms')
+    arg_parser.add_argument('--jitter', type=float, default=5, help='max deviation of the delay, ms')
+    arg_parser.add_argument('--failure-rate', type=float, default=0.02, help='share of event pages answered with 503')
+    arg_parser.add_argument('--expire-after', type=int, default=0, help='event pages served by one session')
+    arg_parser.add_argument('--pages', help='directory with recorded event pages, see benchmarks.portal')
+    args = arg_parser.parse_args()
+
+    process, url = start_portal(args)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ.update({
+                'username': 'check', 'password': 'check',
+                'url_login': url + LOGIN_PATH, 'url_event': url + EVENT_PATH
+            })
+            # Code files go to the temporary directory
+            os.chdir(directory)
+            importlib.invalidate_caches()
+            sys.exit(check(args.workers, url + EVENT_PATH))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def check(workers: int, url_event: str) -> int:
+    """
+    Returns:
+        Exit status: 1 if any counter differs, otherwise 0.
+    """
+    from constants import PERIOD
+    from discovery import HttpDiscovery
+    from parser import User
+    from pipeline import Pipeline
+    from transport import Transport
+
+    transport = Transport()
+    # Neither the page cache nor the manifest, every page is fetched by both
+    aggregate = Pipeline(User(transport), workers).run(HttpDiscovery(transport, PERIOD).iter_codes())
+    serial = SerialCounter(transport, url_event).run(PERIOD.codes_path)
+
+    status = 0
+    for (event_type, action_type, participation_type), expected in serial.items():
+        found = differences(expected, aggregate.table(event_type, action_type, participation_type))
+        print(f'{event_type} {action_type} {participation_type}: {len(expected)} names, '
+              f'{"match" if not found else f"{len(found)} differ"}')
+        for difference in found:
+            print(f'  {difference}')
+        status = status or int(bool(found))
+
+    return status
+
+
+if __name__ == '__main__':
+    main()
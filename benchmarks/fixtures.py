@@ -0,0 +1,58 @@
+"""
+Synthetic event pages, that mimic the layout of the corporate site: a page
+wrapped in layout tables with the participants table inside.
+"""
+
+import random
+from typing import List
+
+from extractor import STYLE_TAG
+
+SURNAMES = (
+    'Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+    'Соколов', 'Михайлов', 'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев',
+    'Лебедев', 'Семенов', 'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев',
+    'Орлов', 'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьев',
+    'Борисов', 'Яковлев', 'Григорьев', 'Романов', 'Воробьев', 'Сергеев', 'Ершов'
+)
+ROLES = (
+    'Принц', 'Фея Сирени', 'Кордебалет', 'Подруги', 'Вариации', 'Миманс',
+    'Педагог-репетитор', 'Концертмейстер', 'Режиссер', 'Инспектор балета', 'Пажи'
+)
+
+
+def names(men: bool = True) -> List[str]:
+    """All synthetic artist names with initials."""
+    suffix = '' if men else 'а'
+    return [f'{surname}{suffix} {initial}.' for surname in SURNAMES for initial in 'АБВГ']
+
+
+def event_page(code: str, rows: int = 40) -> str:
+    """
+    Builds event page with participants table. The same code always gives
+    the same page.
+    Args:
+        code: event code
+        rows: number of roles in the participants table
+    """
+    rand = random.Random(code)
+    artists = names(True) + names(False)
+    cell = f'<td style="{STYLE_TAG}">{{}}</td>'
+    body = []
+    for _ in range(rows):
+        feat = ', '.join(
+            artist + (' (дебют)' if rand.random() < 0.05 else '')
+            for artist in rand.sample(artists, rand.randint(1, 6))
+        )
+        secure = ', '.join(rand.sample(artists, rand.randint(0, 2)))
+        body.append('<tr>' + cell.format(rand.choice(ROLES)) + cell.format(feat) + cell.format(secure) + '</tr>')
+
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Мариинский театр</title></head><body>'
+        '<table class="layout"><tr><td>Меню</td><td><a href="/Home/Index">Расписание</a></td></tr></table>'
+        f'<h3>Событие {code}</h3><table class="info"><tr><td>Дата</td><td>01.09.2023 19:00</td></tr>'
+        '<tr><td>Сцена</td><td>Историческая сцена</td></tr></table>'
+        '<table class="participants"><tr><th>Роль</th><th>Участие</th><th>Запас</th></tr>'
+        + ''.join(body) +
+        '</table><footer><td>©</td></footer></body></html>'
+    )
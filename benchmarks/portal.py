@@ -0,0 +1,251 @@
+"""
+Local stand-in of the corporate site for the benchmarks. Serves the login,
+the form with the event links of a department and the event tables
+/Home/MoreInfo/<code>?a=9|11 from synthetic or recorded pages. Answers
+with configurable latency and occasional failures.
+Usage:
+    python -m benchmarks.portal [--port N] [--events N] [--latency MS] ...
+Recorded pages are taken from --pages directory as <code>_<a>.html, e.g.
+12345_9.html, and the codes of the departments from the file names.
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import xpaths as xp
+from benchmarks.fixtures import event_page
+
+LOGIN_PATH = '/Account/Login'
+HOME_PATH = '/Home/Index'
+EVENT_PATH = '/Home/MoreInfo/'
+
+# Department dropdown: the index of the option is MENU_CODES of discovery
+DEPARTMENTS = ('Все', 'Опера', 'Оркестр', 'Балет', 'Хор', 'Солисты', 'Миманс')
+BALLET_MENU, EXTRAS_MENU = 'dep3', 'dep6'
+
+# Link texts of the department with the weights, they appear with
+LINK_TEXTS = {
+    BALLET_MENU: (('Спящая красавица', 5), ('Реп. +балет', 3), ('Ген. реп.', 1), ('Урок балета', 2)),
+    EXTRAS_MENU: (('Спящая красавица', 5), ('Реп. миманс', 2), ('Тех. работы', 1), ('Занятие +миманс', 1))
+}
+
+
+class Portal:
+    def __init__(self, events: int = 100, rows: int = 40, latency: float = 0, jitter: float = 0,
+                 failure_rate: float = 0, expire_after: int = 0, pages: str = None, seed: int = 0):
+        """
+        Args:
+            events: number of events of every department
+            rows: number of roles in a synthetic participants table
+            latency: mean delay of every response in seconds
+            jitter: max deviation of the delay from the mean in seconds
+            failure_rate: share of event pages answered with 503
+            expire_after: number of event pages a session serves before it
+                expires. Sessions don't expire if 0.
+            pages: directory with recorded event pages. Synthetic pages if None.
+            seed: seed of the event links, latency and failures
+        """
+        self.rows = rows
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.expire_after = expire_after
+        self.pages = pages
+        self.random = random.Random(seed)
+        self.links = self.__recorded_links() if pages else self.__synthetic_links(events, seed)
+
+        # Session id -> number of event pages served
+        self.sessions: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def __synthetic_links(events: int, seed: int) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Half of the extras events are shared with the ballet, as on the site.
+        Returns:
+            Menu code -> event code and link text.
+        """
+        rand = random.Random(seed)
+        codes = {
+            BALLET_MENU: range(100000, 100000 + events),
+            EXTRAS_MENU: range(100000 + events // 2, 100000 + events // 2 + events)
+        }
+        links = {}
+        for menu, menu_codes in codes.items():
+            texts, weights = zip(*LINK_TEXTS[menu])
+            links[menu] = [(str(code), rand.choices(texts, weights)[0]) for code in menu_codes]
+
+        return links
+
+    def __recorded_links(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Every recorded page is listed as a performance of its department."""
+        links = {BALLET_MENU: [], EXTRAS_MENU: []}
+        for file_name in sorted(os.listdir(self.pages)):
+            code, _, menu_code = os.path.splitext(file_name)[0].partition('_')
+            menu = BALLET_MENU if menu_code == '9' else EXTRAS_MENU
+            links[menu].append((code, 'Спектакль'))
+
+        return links
+
+    def delay(self) -> None:
+        if self.latency or self.jitter:
+            with self.lock:
+                delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+            time.sleep(max(delay, 0))
+
+    def fails(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.failure_rate
+
+    def login(self) -> str:
+        session = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[session] = 0
+        return session
+
+    def serve_event(self, session: Optional[str]) -> bool:
+        """
+        Counts the event page of the session.
+        Returns:
+            False if the session has expired.
+        """
+        with self.lock:
+            if session not in self.sessions:
+                return False
+            if self.expire_after and self.sessions[session] >= self.expire_after:
+                del self.sessions[session]
+                return False
+            self.sessions[session] += 1
+            return True
+
+    def event(self, event_code: str, menu_code: str) -> Optional[str]:
+        if self.pages is None:
+            return event_page(f'{event_code}?a={menu_code}', self.rows)
+
+        path = os.path.join(self.pages, f'{event_code}_{menu_code}.html')
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding='utf-8') as file:
+            return file.read()
+
+    def home(self, menu: str = None) -> str:
+        """The form with the dates and the department and the links of the chosen department."""
+        options = ''.join(f'<option value="dep{i}">{name}</option>' for i, name in enumerate(DEPARTMENTS))
+        links = ''.join(
+            f'<li><a href="{EVENT_PATH}{code}">{text} {code}</a></li>' for code, text in self.links.get(menu, ())
+        )
+        return (
+            '<!DOCTYPE html><html><head><meta charset="utf-8"></head><body>'
+            f'<form method="post" action="{HOME_PATH}">'
+            f'<input id="{xp.start_date}" name="StartDate"><input id="{xp.final_date}" name="FinishDate">'
+            f'<select name="Department">{options}</select>'
+            f'<button id="{xp.submit}" name="Submit" value="1">Показать</button></form>'
+            f'<ul>{links}</ul></body></html>'
+        )
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    portal: Portal = None
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def __send(self, status: int, body: str = '', headers: Tuple[Tuple[str, str], ...] = ()) -> None:
+        content = body.encode('utf-8')
+        self.send_response(status)
+        for header in headers:
+            self.send_header(*header)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def __redirect(self, location: str, *headers: Tuple[str, str]) -> None:
+        self.__send(302, headers=(('Location', location), *headers))
+
+    def __session(self) -> Optional[str]:
+        for cookie in self.headers.get('Cookie', '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == 'session':
+                return value
+
+    def __login_page(self) -> None:
+        self.__send(200, f'<form method="post"><input id="{xp.username}" name="UserName">'
+                         f'<input id="{xp.password}" name="Password"></form>')
+
+    def do_GET(self) -> None:
+        self.portal.delay()
+        path = urlsplit(self.path).path
+        if path == LOGIN_PATH:
+            return self.__login_page()
+        if path == HOME_PATH:
+            if self.__session() not in self.portal.sessions:
+                return self.__redirect(LOGIN_PATH)
+            return self.__send(200, self.portal.home())
+
+        self.__send(404)
+
+    def do_POST(self) -> None:
+        self.portal.delay()
+        form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8'))
+        url = urlsplit(self.path)
+        if url.path == LOGIN_PATH:
+            session = self.portal.login()
+            return self.__redirect(HOME_PATH, ('Set-Cookie', f'session={session}; Path=/'))
+        if url.path == HOME_PATH:
+            if self.__session() not in self.portal.sessions:
+                return self.__redirect(LOGIN_PATH)
+            return self.__send(200, self.portal.home(form.get('Department', [None])[0]))
+        if url.path.startswith(EVENT_PATH):
+            if self.portal.fails():
+                return self.__send(503, 'Service Unavailable')
+            if not self.portal.serve_event(self.__session()):
+                return self.__redirect(f'{LOGIN_PATH}?ReturnUrl={url.path}')
+            page = self.portal.event(url.path[len(EVENT_PATH):], parse_qs(url.query).get('a', ['9'])[0])
+            return self.__send(404) if page is None else self.__send(200, page)
+
+        self.__send(404)
+
+
+def serve(portal: Portal, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Creates the server of the portal. The caller runs serve_forever.
+    Args:
+        port: port on localhost, any free port if 0
+    """
+    handler = type('PortalHandler', (Handler,), {'portal': portal})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--events', type=int, default=100, help='events of every department')
+    arg_parser.add_argument('--rows', type=int, default=40, help='roles of a synthetic event')
+    arg_parser.add_argument('--latency', type=float, default=0, help='mean delay of a response, ms')
+    arg_parser.add_argument('--jitter', type=float, default=0, help='max deviation of the delay, ms')
+    arg_parser.add_argument('--failure-rate', type=float, default=0, help='share of event pages answered with 503')
+    arg_parser.add_argument('--expire-after', type=int, default=0, help='event pages served by one session')
+    arg_parser.add_argument('--pages', help='directory with recorded event pages')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    portal = Portal(args.events, args.rows, args.latency / 1000, args.jitter / 1000,
+                    args.failure_rate, args.expire_after, args.pages, args.seed)
+    server = serve(portal, args.port)
+    print(f'Portal on http://127.0.0.1:{server.server_port}{LOGIN_PATH}', flush=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Persistent cache of fetched event pages. Pages are compressed with zlib
+and kept in a single SQLite file shared by every run.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+from config import CACHE_TTL, CACHE_MAX_SIZE
+from constants import CACHE_PATH
+from utils import create_parent_dir
+
+
+class PageCache:
+    def __init__(self, path: str = CACHE_PATH, ttl: int = CACHE_TTL, max_size: int = CACHE_MAX_SIZE):
+        """
+        Args:
+            path: SQLite file with the cached pages
+            ttl: page lifetime, sec
+            max_size: max total size of the compressed pages, bytes
+        """
+        create_parent_dir(path)
+
+        self.ttl, self.max_size = ttl, max_size
+        self.hits, self.misses = 0, 0
+        self.__lock = threading.Lock()
+        # The cache might be shared by several processes of the batch mode
+        self.__connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'event_code TEXT, menu_code TEXT, page BLOB, size INTEGER, fetched REAL, '
+            'PRIMARY KEY (event_code, menu_code))'
+        )
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS pages_fetched ON pages (fetched)')
+        self.__size = 0
+        self.__evict()
+
+    def get(self, event_code: str, menu_code: str) -> Optional[str]:
+        """
+        Returns:
+            Cached page or None, if the page is missing or expired.
+        """
+        with self.__lock:
+            row = self.__connection.execute(
+                'SELECT page, fetched FROM pages WHERE event_code = ? AND menu_code = ?',
+                (event_code, menu_code)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, event_code: str, menu_code: str, page: str) -> None:
+        """Compresses and stores the page. Evicts the oldest pages on overflow."""
+        blob = zlib.compress(page.encode('utf-8'))
+        with self.__lock:
+            self.__connection.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)',
+                (event_code, menu_code, blob, len(blob), time.time())
+            )
+            self.__size += len(blob)
+            if self.__size > self.max_size:
+                self.__evict()
+
+    def __evict(self) -> None:
+        """
+        Removes expired pages, then the oldest pages until the cache takes 90%
+        of max_size, so the eviction doesn't run on every put.
+        """
+        self.__connection.execute('DELETE FROM pages WHERE fetched < ?', (time.time() - self.ttl,))
+        self.__size = self.__connection.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        if self.__size <= self.max_size:
+            return
+
+        excess, cutoff = self.__size - int(self.max_size * 0.9), None
+        for size, fetched in self.__connection.execute('SELECT size, fetched FROM pages ORDER BY fetched'):
+            excess -= size
+            cutoff = fetched
+            if excess <= 0:
+                break
+        self.__connection.execute('DELETE FROM pages WHERE fetched <= ?', (cutoff,))
+        self.__size = self.__connection.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        logging.info(f'Page cache evicted down to {self.__size} bytes')
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Number of cache hits, misses and total size of the cached pages.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': self.__size}
@@ -0,0 +1,265 @@
+"""
+Command line of the separate steps of a report. Every step imports only
+what it needs: discover and fetch go to the site, aggregate works on the
+code files and the manifest or on the participation store, export-xls and
+export-db on the csv files, person on the participation store.
+The worker mode splits fetch between processes of one or several hosts:
+enqueue puts the discovered codes into the work queue, every work process
+fetches the pages, it claims, collect counts the reports from the results.
+Usage:
+    python cli.py discover [--start DD.MM.YYYY --final DD.MM.YYYY]
+    python cli.py fetch
+    python cli.py aggregate [--store] [--skip-roles ROLE,ROLE...]
+    python cli.py export-xls
+    python cli.py export-db [--url URL]
+    python cli.py person NAME
+    python cli.py enqueue [--refresh] [--queue PATH]
+    python cli.py work [--processes N] [--follow] [--queue PATH]
+    python cli.py collect [--queue PATH]
+main.py runs all the steps at once.
+"""
+
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import PROCESSES
+from constants import PERIOD, QUEUE_PATH
+from period import Period
+
+
+def discover(period: Period, args: argparse.Namespace) -> None:
+    """Writes the codes of the period to the code files."""
+    from participation import ParticipationStore
+    from pipeline import discover_codes
+    from transport import Transport
+
+    store = ParticipationStore()
+    codes = sum(1 for _ in discover_codes(Transport(), period, store))
+    logging.info(f'{period.dates}: {codes} codes discovered, {store.stats()["events"]} events stored')
+
+
+def fetch(period: Period, args: argparse.Namespace) -> None:
+    """Fetches and parses the pages of the code files into the manifest."""
+    from cache import PageCache
+    from config import INCREMENTAL, INCREMENTAL_MAX_AGE
+    from codes import read_codes
+    from manifest import Manifest
+    from parser import User
+    from participation import ParticipationStore
+    from pipeline import Pipeline
+    from transport import Transport
+
+    cache = PageCache()
+    manifest = Manifest(period.manifest_path, max_age=INCREMENTAL_MAX_AGE if INCREMENTAL else 0)
+    store = ParticipationStore()
+    Pipeline(User(Transport(), cache, manifest, store)).fetch(read_codes(period))
+    manifest.save()
+    logging.info(f'{period.dates} page cache: {cache.stats()}')
+    logging.info(f'{period.dates} manifest: {manifest.stats()}')
+    logging.info(f'{period.dates} participations: {store.stats()}')
+
+
+def aggregate(period: Period, args: argparse.Namespace) -> None:
+    """Counts the reports from the manifest or the store and writes them to csv."""
+    from config import DEBUG_OUTPUTS
+    from pipeline import recount, rederive
+    from sinks import CsvSink, JsonSink
+
+    if args.store or args.skip_roles is not None:
+        counted = rederive(period) if args.skip_roles is None else rederive(period, args.skip_roles)
+    else:
+        counted = recount(period)
+    if DEBUG_OUTPUTS:
+        JsonSink(period).write(counted)
+    CsvSink(period).write(counted)
+    logging.info(f'{period.dates}: reports written to {period.csv_path}')
+
+
+def csv_tables(period: Period) -> Iterator[Tuple[Tuple[str, str], List[List]]]:
+    from aggregate import TABLES
+    from sinks import CsvSink
+
+    sink = CsvSink(period)
+    return ((table, sink.read_table(*table)) for table in TABLES)
+
+
+def export_xls(period: Period, args: argparse.Namespace) -> None:
+    """Writes the csv reports to the xls template."""
+    from sinks import XlsSink
+
+    XlsSink(period).write_tables(csv_tables(period))
+    logging.info(f'{period.dates}: reports written to {period.xls_path}')
+
+
+def export_db(period: Period, args: argparse.Namespace) -> None:
+    """Writes the csv reports to the table of the period."""
+    from sinks import DbSink
+
+    DbSink(period, args.url).write_tables(csv_tables(period))
+    logging.info(f'{period.dates}: reports written to table {period.table_name}')
+
+
+def person(period: Period, args: argparse.Namespace) -> None:
+    """Lists the stored participations of the person in the period."""
+    from participation import ParticipationStore
+
+    participations = ParticipationStore().person(args.name, period)
+    for event_type, event_code, action_type, role, participation_type in participations:
+        print(f'{event_type:<8}{event_code:<10}{action_type:<7}{participation_type:<8}{role}')
+    logging.info(f'{period.dates}: {len(participations)} participations of {args.name}')
+
+
+def enqueue(period: Period, args: argparse.Namespace) -> None:
+    """Discovers the codes of the period and puts them into the work queue."""
+    from participation import ParticipationStore
+    from pipeline import discover_codes
+    from transport import Transport
+    from workqueue import WorkQueue
+
+    queue = WorkQueue(args.queue)
+    codes = queue.enqueue(period, discover_codes(Transport(), period, ParticipationStore()), args.refresh)
+    logging.info(f'{period.dates}: {codes} codes queued, pages: {queue.stats(period)}')
+
+
+def work_process(queue_path: str, state: Dict, processes: int, follow: bool) -> int:
+    """
+    Fetches pages from the queue in a worker process on the login of the
+    main process. The processes share the rate limit of config equally.
+    Returns:
+        Number of pages done by the process.
+    """
+    from cache import PageCache
+    from config import RATE, RATE_MIN, RATE_MAX
+    from parser import User
+    from participation import ParticipationStore
+    from ratelimit import RateLimiter
+    from transport import Transport
+    import workqueue
+
+    limiter = RateLimiter(RATE / processes, RATE_MIN / processes, RATE_MAX / processes)
+    user = User(Transport(state=state, limiter=limiter), PageCache(), store=ParticipationStore())
+
+    return workqueue.work(workqueue.WorkQueue(queue_path), user, follow=follow)
+
+
+def work(period: Period, args: argparse.Namespace) -> None:
+    """Fetches the pages of every period from the work queue, till it's empty."""
+    from transport import Transport
+    from workqueue import WorkQueue
+
+    state = Transport().state()
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = [
+            executor.submit(work_process, args.queue, state, args.processes, args.follow)
+            for _ in range(args.processes)
+        ]
+        done = sum(future.result() for future in futures)
+    logging.info(f'{done} pages done, pages: {WorkQueue(args.queue).stats()}')
+
+
+def collect(period: Period, args: argparse.Namespace) -> None:
+    """Counts the reports from the results of the work queue and writes them to csv."""
+    import pipeline
+    from config import DEBUG_OUTPUTS
+    from sinks import CsvSink, JsonSink
+    from workqueue import WorkQueue
+
+    counted = pipeline.collect(period, WorkQueue(args.queue))
+    if DEBUG_OUTPUTS:
+        JsonSink(period).write(counted)
+    CsvSink(period).write(counted)
+    logging.info(f'{period.dates}: reports written to {period.csv_path}')
+
+
+def missing_step(period: Period, command: str, error: Exception) -> Optional[str]:
+    """
+    Returns:
+        Step, that writes the inputs of the command, if the error means
+        they are missing, None otherwise.
+    """
+    if isinstance(error, FileNotFoundError):
+        # The steps read the files, that the previous steps wrote
+        for path, step in ((period.codes_path, 'discover'), (period.csv_path, 'aggregate')):
+            if str(error.filename).startswith(path):
+                return step
+        return None
+
+    # Only the steps, that count the reports, raise the errors of pipeline
+    from pipeline import CodesMissing, PageMissing
+
+    if isinstance(error, CodesMissing):
+        return 'enqueue' if command == 'collect' else 'discover'
+    if isinstance(error, PageMissing):
+        return 'work' if command == 'collect' else 'fetch'
+    return None
+
+
+def skip_roles(value: str) -> Tuple[str, ...]:
+    return tuple(role.strip() for role in value.split(',') if role.strip())
+
+
+COMMANDS = {
+    'discover': discover,
+    'fetch': fetch,
+    'aggregate': aggregate,
+    'export-xls': export_xls,
+    'export-db': export_db,
+    'person': person,
+    'enqueue': enqueue,
+    'work': work,
+    'collect': collect
+}
+
+
+def main(argv: List[str] = None) -> None:
+    logging.basicConfig(
+        format='%(asctime)s - %(message)s',
+        datefmt='%d-%b-%y %H:%M:%S',
+        level=logging.INFO
+    )
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+    for name, command in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=command.__doc__)
+        subparser.add_argument('--start', help='start date, DD.MM.YYYY, the period of config if not set')
+        subparser.add_argument('--final', help='final date, DD.MM.YYYY')
+        if command is aggregate:
+            subparser.add_argument('--store', action='store_true',
+                                   help='count from the participation store instead of the manifest')
+            subparser.add_argument('--skip-roles', type=skip_roles,
+                                   help='comma separated substrings of the roles to skip, counts from the '
+                                        'store, parser.SKIP_ROLES if not set')
+        if command is export_db:
+            subparser.add_argument('--url', help='database url, the database of config if not set')
+        if command is person:
+            subparser.add_argument('name', help='name of the person as on the event pages')
+        if command in (enqueue, work, collect):
+            subparser.add_argument('--queue', default=QUEUE_PATH, help='SQLite file of the work queue')
+        if command is enqueue:
+            subparser.add_argument('--refresh', action='store_true', help='queue the pages, that are done, again')
+        if command is work:
+            subparser.add_argument('--processes', type=int, default=PROCESSES, help='worker processes of the host')
+            subparser.add_argument('--follow', action='store_true', help='wait for new pages, when the queue is empty')
+    args = arg_parser.parse_args(argv)
+
+    period = PERIOD
+    if args.start or args.final:
+        try:
+            period = Period(args.start or args.final, args.final or args.start)
+        except ValueError as error:
+            arg_parser.error(str(error))
+
+    try:
+        COMMANDS[args.command](period, args)
+    except Exception as error:
+        step = missing_step(period, args.command, error)
+        if step is None:
+            raise
+        message = f'{error.filename} not found' if isinstance(error, FileNotFoundError) else str(error)
+        arg_parser.error(f'{message}, run {step} first')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Code files of a period: event codes of every department and action type,
+one per line. Written by discovery, read by the steps after it. Kept apart
+from discovery, so the steps, that don't go to the site, don't import lxml.
+"""
+
+import os
+from typing import Iterator, Set, Tuple
+
+from constants import PERIOD, BALLET, EXTRAS, PERFS, REHS
+from period import Period
+
+
+def write_codes(event_type: str, perfs_codes: Set[str], rehs_codes: Set[str], period: Period = PERIOD) -> None:
+    """Writes unique event codes to 2 files with corresponding names."""
+    if not os.path.isdir(period.codes_path):
+        os.makedirs(period.codes_path)
+
+    for action_type in zip((perfs_codes, rehs_codes), (PERFS, REHS)):
+        with open(f'{period.codes_path}{event_type}_{action_type[1]}', 'w') as file:
+            for code in sorted(action_type[0]):
+                file.write(code + '\n')
+
+
+def read_codes(period: Period = PERIOD) -> Iterator[Tuple[str, str, str]]:
+    """
+    Reads event codes written by write_codes.
+    Yields:
+        Event type, action type and event code.
+    """
+    for event_type in (BALLET, EXTRAS):
+        for action_type in (PERFS, REHS):
+            with open(f'{period.codes_path}{event_type}_{action_type}') as codes:
+                for code in codes.read().split():
+                    yield event_type, action_type, code
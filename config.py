@@ -1,10 +1,10 @@
 import os
 
-# Account
-USERNAME = os.environ['username']
-PASSWORD = os.environ['password']
-URL_LOGIN = os.environ['url_login']
-URL_EVENT = os.environ['url_event']
+# Account. Checked on login, the steps, that don't go to the site, don't need it
+USERNAME = os.environ.get('username')
+PASSWORD = os.environ.get('password')
+URL_LOGIN = os.environ.get('url_login')
+URL_EVENT = os.environ.get('url_event')
 
 # Dates
 YEAR = 2023
@@ -12,9 +12,67 @@ MONTH = 4
 START_DATE = '01.09.2023'
 FINAL_DATE = '30.09.2023'
 
+# Fetching
+# Number of event pages fetched at once
+WORKERS = 8
+# Retries of a failed request and backoff factor between them, sec
+RETRIES = 3
+BACKOFF = 1
+# Connect and read timeouts of a request, sec. A stalled read is retried
+# like a failed request
+TIMEOUT = (10, 60)
+# Rate limit of the requests to the site, req/sec. Grows while the site
+# answers fast and falls on slow answers and errors within the bounds.
+# Starts at the pace of the 1-2 sec pauses between the requests, that the
+# site has been used to
+RATE = 0.7
+RATE_MIN = 0.2
+RATE_MAX = 2
+# Max number of requests sent at once after a pause
+RATE_BURST = 2
+# Answers slower than TARGET_LATENCY sec slow the requests down
+TARGET_LATENCY = 2
+# Lifetime of a cached event page, sec, and max size of the page cache, bytes
+CACHE_TTL = 12 * 60 * 60
+CACHE_MAX_SIZE = 200 * 1024 * 1024
+# Only fetch new events and events, that might have changed since the last run
+INCREMENTAL = True
+# Incremental runs reuse events parsed less than INCREMENTAL_MAX_AGE sec ago
+# and refetch the older ones to check them for changes
+INCREMENTAL_MAX_AGE = 24 * 60 * 60
+
+# Number of periods processed at once in the batch mode
+PROCESSES = 4
+
+# Work queue of the worker mode
+# Time a worker has to fetch a claimed page, sec. Pages of a crashed worker
+# are claimed by the others after it
+QUEUE_LEASE = 5 * 60
+# A page, that failed that many times, isn't claimed again
+QUEUE_ATTEMPTS = 3
+# Idle workers check the queue for new pages every QUEUE_POLL sec
+QUEUE_POLL = 5
+
+# Outputs
+# Also write intermediate json files with the counters of every report
+DEBUG_OUTPUTS = False
+# Write all the xls tables of a period to one workbook as separate sheets
+XLS_COMBINED = False
+
+# Metrics
+# Also write the metrics of every run in the Prometheus text format, next to
+# the json report, for the node exporter textfile collector
+METRICS_PROMETHEUS = False
+
 # DB
 DB_USER = 'postgres'
 DB_PASSWORD = 'admin'
 DB_HOST = 'localhost'
 DB_PORT = '5432'
 DB_NAME = 'db'
+# Log every SQL statement
+DB_ECHO = False
+# Also write every period to its own table besides the reports table of all
+# the periods. The table is named by YEAR and MONTH, e.g. 2023_4, periods
+# with the same YEAR and MONTH share it
+DB_MONTH_TABLES = True
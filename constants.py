@@ -1,17 +1,20 @@
-from config import START_DATE, FINAL_DATE
-from utils import validate_dates
+from config import START_DATE, FINAL_DATE, YEAR, MONTH
+from period import Period
 
-if validate_dates(START_DATE, FINAL_DATE):
-    DATES = START_DATE + '-' + FINAL_DATE
-else:
-    raise ValueError("Final date shouldn't be earlier than the start date")
+# Period from config
+PERIOD = Period(START_DATE, FINAL_DATE, YEAR, MONTH)
+DATES = PERIOD.dates
 
 # Paths
-CODES_PATH = f'./data/{DATES}/codes/'
-JSON_PATH = f'./data/{DATES}/json/'
-CSV_PATH = f'./data/{DATES}/csv/'
-XLS_PATH = f'./data/{DATES}/xls/'
+CODES_PATH = PERIOD.codes_path
+JSON_PATH = PERIOD.json_path
+CSV_PATH = PERIOD.csv_path
+XLS_PATH = PERIOD.xls_path
+MANIFEST_PATH = PERIOD.manifest_path
 WORKBOOK_PATH = './templates/excel/template.xlsx'
+CACHE_PATH = './data/cache.sqlite3'
+STORE_PATH = './data/participations.sqlite3'
+QUEUE_PATH = './data/queue.sqlite3'
 
 # Event types
 BALLET = 'ballet'
@@ -1,27 +1,146 @@
-from sqlalchemy import Column, SmallInteger, String, create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy_utils import database_exists, create_database
+import logging
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
-from config import YEAR, MONTH, DB_USER, DB_PASSWORD, DB_NAME, DB_HOST, DB_PORT
+from sqlalchemy import Column, Index, SmallInteger, String, Table, create_engine, delete, insert, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import declarative_base
+
+from config import YEAR, MONTH, DB_USER, DB_PASSWORD, DB_NAME, DB_HOST, DB_PORT, DB_ECHO
 
 Base = declarative_base()
 
 
+COUNTERS = ('feat_perfs', 'secure_perfs', 'feat_rehs', 'secure_rehs')
+
+
+def get_table(name: str) -> Table:
+    """Table of a period, e.g. 2023_9. Added to the metadata on the first call."""
+    if name not in Base.metadata.tables:
+        Table(
+            name, Base.metadata,
+            Column('name', String(50), primary_key=True, nullable=False),
+            *(Column(counter, SmallInteger) for counter in COUNTERS)
+        )
+
+    return Base.metadata.tables[name]
+
+
 class Book(Base):
-    __tablename__ = f'{YEAR}_{MONTH}'
+    """Table of the period from config."""
+    __table__ = get_table(f'{YEAR}_{MONTH}')
+
+
+class Report(Base):
+    """
+    Rows of the reports of every period in one table. Period is YYYY-MM,
+    department is the event type. Indexed for the history of a name and for
+    the totals of a department over a range of periods.
+    """
+    __table__ = Table(
+        'reports', Base.metadata,
+        Column('period', String(7), primary_key=True, nullable=False),
+        Column('department', String(10), primary_key=True, nullable=False),
+        Column('gender', String(5), primary_key=True, nullable=False),
+        Column('name', String(50), primary_key=True, nullable=False),
+        *(Column(counter, SmallInteger, nullable=False) for counter in COUNTERS),
+        Index('reports_name_period', 'name', 'period'),
+        Index('reports_department_period', 'department', 'period')
+    )
+
+
+class MonthTable(Base):
+    """
+    Period of the reports table, that the sinks wrote to a table of a
+    period. The table is named by the year and month of config, not by the
+    dates, e.g. the reports of 2023-09 go to 2023_4, so its name doesn't
+    tell the period.
+    """
+    __table__ = Table(
+        'month_tables', Base.metadata,
+        Column('table_name', String(20), primary_key=True, nullable=False),
+        Column('period', String(7), nullable=False)
+    )
+
+
+@lru_cache
+def get_engine(url: str = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}') -> Engine:
+    """
+    Connects to the database on the first call. Creates it and the reports
+    table if needed. Tables of the periods are created by the sinks, that
+    write them.
+    """
+    # sqlalchemy_utils takes longer to import than SQLAlchemy itself
+    from sqlalchemy_utils import database_exists, create_database
+
+    engine = create_engine(url, echo=DB_ECHO)
+
+    if not database_exists(engine.url):
+        create_database(engine.url)
+
+    Base.metadata.create_all(engine, tables=[Report.__table__])
+    return engine
+
+
+def upsert_books(connection: Connection, rows: List[Dict[str, int]], table: Table = Book.__table__) -> None:
+    """
+    Inserts all rows in one executemany. Updates counters of the names, that
+    are already in the table, so the same period can be written again.
+    Args:
+        rows: dicts with name and 4 counters
+        table: table of the period
+    """
+    if not rows:
+        return
+
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={counter: statement.excluded[counter] for counter in COUNTERS}
+    )
+    connection.execute(statement, rows)
+
 
-    name = Column(String(50), primary_key=True, nullable=False)
-    feat_perfs = Column(SmallInteger)
-    secure_perfs = Column(SmallInteger)
-    feat_rehs = Column(SmallInteger)
-    secure_rehs = Column(SmallInteger)
+def replace_reports(connection: Connection, period: str, tables: Dict[Tuple[str, str], List[Dict[str, int]]]
+                    ) -> None:
+    """
+    Replaces the rows of every report table of the period in the reports
+    table, so names, that dropped out of a report, don't stay.
+    Args:
+        period: period in format YYYY-MM
+        tables: (department, gender) -> dicts with name and 4 counters
+    """
+    table = Report.__table__
+    rows = []
+    for (department, gender), names in tables.items():
+        connection.execute(delete(table).where(
+            table.c.period == period, table.c.department == department, table.c.gender == gender
+        ))
+        rows.extend({'period': period, 'department': department, 'gender': gender, **row} for row in names)
 
+    if rows:
+        connection.execute(insert(table), rows)
 
-engine = create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}", echo=True)
 
-if not database_exists(engine.url):
-    create_database(engine.url)
+def record_month_table(connection: Connection, table_name: str, period: str) -> None:
+    """
+    Records the period, that is written to the table of a period. Several
+    periods with the same year and month of config share one table, their
+    rows are mixed then.
+    Args:
+        period: period in format YYYY-MM
+    """
+    table = MonthTable.__table__
+    recorded = connection.execute(select(table.c.period).where(table.c.table_name == table_name)).scalar()
+    if recorded == period:
+        return
+    if recorded is not None:
+        logging.warning(f'{table_name}: rows of period {period} are written over the rows of period {recorded}')
 
-Base.metadata.create_all(engine)
-session = sessionmaker(bind=engine)
-s = session()
+    connection.execute(delete(table).where(table.c.table_name == table_name))
+    connection.execute(insert(table), {'table_name': table_name, 'period': period})
@@ -0,0 +1,163 @@
+"""
+Queries of the reports table over a range of periods: history of a name,
+totals of the departments and rankings. Migration of the tables of the
+periods, that were written before the reports table, into it.
+Periods are in format YYYY-MM, both ends of a range are included.
+"""
+
+import logging
+import re
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import Row, Select, func, inspect, select
+from sqlalchemy.engine import Connection
+
+from aggregate import TABLES, StaffIndex, get_staff, normalize
+from db.db import COUNTERS, MonthTable, Report, get_table, replace_reports
+
+# Table of a period, e.g. 2023_9
+MONTH_TABLE = re.compile(r'(\d{4})_(\d{1,2})')
+
+# Counters, that are summed up for a ranking
+RANKINGS = {
+    **{counter: (counter,) for counter in COUNTERS},
+    'perfs': ('feat_perfs', 'secure_perfs'),
+    'rehs': ('feat_rehs', 'secure_rehs'),
+    'total': COUNTERS
+}
+
+
+def in_periods(statement: Select, start: Optional[str], final: Optional[str]) -> Select:
+    """Limits the statement to the periods from start to final, if they are set."""
+    table = Report.__table__
+    if start:
+        statement = statement.where(table.c.period >= start)
+    if final:
+        statement = statement.where(table.c.period <= final)
+
+    return statement
+
+
+def history(connection: Connection, name: str, start: str = None, final: str = None) -> Sequence[Row]:
+    """
+    Returns:
+        Rows of the name in every report in time order: period, department,
+        gender and 4 counters.
+    """
+    table = Report.__table__
+    statement = select(
+        table.c.period, table.c.department, table.c.gender, *(table.c[counter] for counter in COUNTERS)
+    ).where(table.c.name == name)
+
+    return connection.execute(
+        in_periods(statement, start, final).order_by(table.c.period, table.c.department, table.c.gender)
+    ).all()
+
+
+def totals(connection: Connection, start: str = None, final: str = None, department: str = None
+           ) -> Sequence[Row]:
+    """
+    Returns:
+        Rows of every department in every period in time order: period,
+        department, number of names and sums of 4 counters.
+    """
+    table = Report.__table__
+    statement = select(
+        table.c.period, table.c.department, func.count().label('names'),
+        *(func.sum(table.c[counter]).label(counter) for counter in COUNTERS)
+    )
+    if department:
+        statement = statement.where(table.c.department == department)
+
+    return connection.execute(
+        in_periods(statement, start, final)
+        .group_by(table.c.period, table.c.department)
+        .order_by(table.c.period, table.c.department)
+    ).all()
+
+
+def top(connection: Connection, limit: int = 10, by: str = 'total', start: str = None, final: str = None,
+        department: str = None, gender: str = None) -> Sequence[Row]:
+    """
+    Args:
+        by: key of RANKINGS, the counters to sum up
+    Returns:
+        Names with the largest sums of the counters over the periods: name,
+        department and the sum.
+    """
+    table = Report.__table__
+    columns = [table.c[counter] for counter in RANKINGS[by]]
+    score = func.sum(sum(columns[1:], columns[0]))
+    statement = select(table.c.name, table.c.department, score.label(by))
+    if department:
+        statement = statement.where(table.c.department == department)
+    if gender:
+        statement = statement.where(table.c.gender == gender)
+
+    return connection.execute(
+        in_periods(statement, start, final)
+        .group_by(table.c.name, table.c.department)
+        .order_by(score.desc(), table.c.name)
+        .limit(limit)
+    ).all()
+
+
+def migrate_months(connection: Connection, staff: StaffIndex = None, overwrite: bool = False) -> Dict[str, int]:
+    """
+    Copies the tables of the periods to the reports table. The tables of the
+    periods have no department and gender, they are taken from the staff
+    lists. A name, that is in several lists, was written with the counters
+    of the last of TABLES, so it goes to that one.
+    Tables, that DbSink wrote next to the reports table, are recorded with
+    their period and skipped, if the period is in the reports table: their
+    name is the year and month of config, not of the period, and they keep
+    only one row of a name.
+    Args:
+        staff: index of the staff lists. The staff.staff module if None.
+        overwrite: replace the periods, that are already in the reports
+            table. They are skipped otherwise.
+    Returns:
+        Number of migrated tables and rows, of the skipped tables and of the
+        names, that are in none of the staff lists. Empty tables aren't
+        counted.
+    """
+    staff = staff or get_staff()
+    tables_of = {}
+    for table in TABLES:
+        tables_of.update(dict.fromkeys(staff.keys[table], table))
+
+    stats = {'tables': 0, 'rows': 0, 'skipped': 0, 'unmatched': 0}
+    periods = set(connection.execute(select(Report.__table__.c.period).distinct()).scalars())
+    table_names = inspect(connection).get_table_names()
+    recorded = {}
+    if MonthTable.__table__.name in table_names:
+        recorded = dict(connection.execute(select(MonthTable.__table__)).all())
+    for table_name in sorted(table_names):
+        match = MONTH_TABLE.fullmatch(table_name)
+        if match is None:
+            continue
+        period = recorded.get(table_name, f'{match.group(1)}-{int(match.group(2)):02}')
+        if period in periods and (table_name in recorded or not overwrite):
+            logging.info(f'{table_name}: period {period} is already in the reports table, skipped')
+            stats['skipped'] += 1
+            continue
+
+        reports, rows = {table: [] for table in TABLES}, 0
+        for row in connection.execute(select(get_table(table_name))).mappings():
+            table = tables_of.get(normalize(row['name']))
+            if table is None:
+                logging.warning(f'{table_name}: {row["name"]} is in none of the staff lists, skipped')
+                stats['unmatched'] += 1
+                continue
+            # Counters of the tables of the periods are nullable
+            reports[table].append({**row, **{counter: row[counter] or 0 for counter in COUNTERS}})
+            rows += 1
+        if not rows:
+            continue
+
+        replace_reports(connection, period, reports)
+        stats['tables'] += 1
+        stats['rows'] += rows
+        logging.info(f'{table_name}: {rows} rows migrated to period {period}')
+
+    return stats
@@ -0,0 +1,187 @@
+"""
+Discovery of the event codes. Submits the date range and department over
+plain HTTP on the shared session and classifies every event link as a
+performance, a rehearsal or a skipped event. parser.Driver does the same
+via webdriver and is kept as a fallback.
+"""
+
+import logging
+import re
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import lxml.html
+
+import xpaths as xp
+from codes import write_codes
+from constants import PERIOD, BALLET, EXTRAS, PERFS, REHS
+from metrics import get_metrics
+from period import Period
+
+if TYPE_CHECKING:
+    from participation import ParticipationStore
+    from transport import Transport
+
+# Index of the department in the dropdown menu
+MENU_CODES = {BALLET: '3', EXTRAS: '6'}
+
+# Link text keywords of the rehearsals and of the events to skip
+REHS_COMMON = {'Реп.', 'Сц. фп.', 'Орк. сцен. реп.', 'Ген. реп.'}
+SKIP_PART_COMMON = {'Явка на грим', '(сверка)'}
+REHS_KEYWORDS = {
+    BALLET: REHS_COMMON.union({'+балет'}),
+    EXTRAS: REHS_COMMON.union({'Тех. работы', 'миманс'})
+}
+SKIP_PART = {
+    BALLET: SKIP_PART_COMMON.union({'Урок балета'}),
+    EXTRAS: SKIP_PART_COMMON.union({'Занятие +миманс'})
+}
+
+
+class DiscoveryError(Exception):
+    """The site didn't return the form or the links, that were expected."""
+
+
+def classify(event_type: str, link_text: str) -> Optional[str]:
+    """
+    Returns:
+        PERFS or REHS by the link text or None, if the event is skipped.
+    """
+    if any(event in link_text for event in SKIP_PART[event_type]):
+        return None
+    if any(event in link_text for event in REHS_KEYWORDS[event_type]):
+        return REHS
+
+    return PERFS
+
+
+class HttpDiscovery:
+    def __init__(self, transport: 'Transport', period: Period = PERIOD, store: 'ParticipationStore' = None):
+        """
+        Args:
+            transport: logged in transport shared by every fetch in the run
+            period: dates to discover the codes for
+            store: records the classification of every event, the skipped
+                ones included. Not recorded if None.
+        """
+        self.transport = transport
+        self.period = period
+        self.store = store
+        # Event links of every department, skipped ones included
+        self.__links = 0
+
+    def __get_form(self) -> Tuple[str, str, Dict[str, str], lxml.html.SelectElement]:
+        """
+        Finds the form with the start and final dates on the page, the site
+        redirects to after login, and fills in the dates.
+        Returns:
+            Form method, form url, form values and department dropdown.
+        """
+        response = self.transport.get(self.transport.home_url)
+        response.raise_for_status()
+        forms = lxml.html.fromstring(response.text).xpath(f"//form[.//*[@id='{xp.start_date}']]")
+        if not forms:
+            raise DiscoveryError(f'No form with the dates on {response.url}')
+        form = forms[0]
+
+        fields = dict(form.form_values())
+        for field_id, date in ((xp.start_date, self.period.start_date), (xp.final_date, self.period.final_date)):
+            field = form.get_element_by_id(field_id, None)
+            if field is None or field.get('name') is None:
+                raise DiscoveryError(f'No field {field_id} in the form')
+            fields[field.get('name')] = date
+
+        selects = form.xpath('.//select[@name]')
+        if not selects:
+            raise DiscoveryError('No department dropdown in the form')
+
+        submit = form.get_element_by_id(xp.submit, None)
+        if submit is not None and submit.get('name'):
+            fields[submit.get('name')] = submit.get('value', '')
+
+        return form.method, urljoin(response.url, form.action or ''), fields, selects[0]
+
+    def __get_links(self, event_type: str) -> Iterator[Tuple[str, str]]:
+        """
+        Classifies the event links of the department. Skipped events aren't
+        yielded, but go to the store with the others.
+        Yields:
+            Action type and event code.
+        """
+        with get_metrics().timer('discovery'):
+            links = self.__submit_form(event_type)
+        self.__links += len(links)
+
+        events = []
+        for link in links:
+            title = link.text_content()
+            action_type = classify(event_type, title)
+            code = re.search(r'\d+', link.get('href')).group()
+            events.append((code, action_type, title))
+            if action_type is not None:
+                yield action_type, code
+
+        if self.store is not None:
+            self.store.put_events(self.period, event_type, events)
+
+    def __submit_form(self, event_type: str) -> List[lxml.html.HtmlElement]:
+        """
+        Submits the form for the department.
+        Returns:
+            Event links of the department, empty if it has no events.
+        Raises:
+            requests.HTTPError: if the site answers with an error.
+            DiscoveryError: if the answer isn't the page of the results.
+        """
+        method, url, fields, select = self.__get_form()
+        options = select.xpath('.//option')
+        menu_code = int(MENU_CODES[event_type])
+        if len(options) <= menu_code:
+            raise DiscoveryError(f'No {event_type} in the department dropdown')
+        fields[select.name] = options[menu_code].get('value', options[menu_code].text_content())
+        logging.info(f'Choose {event_type} from menu')
+
+        if method == 'GET':
+            response = self.transport.get(url, fields)
+        else:
+            response = self.transport.post(url, fields)
+        # An error answer isn't a month without events
+        response.raise_for_status()
+        if not response.text.strip():
+            raise DiscoveryError(f'Empty answer to the {event_type} form on {response.url}')
+        # The links are rendered next to the form. An answer without the form
+        # isn't the results page, e.g. the login page of an expired session
+        page = lxml.html.fromstring(response.text)
+        if not page.xpath(f"//*[@id='{xp.start_date}']"):
+            raise DiscoveryError(f'No results of the {event_type} form on {response.url}')
+        links = page.xpath(xp.links)
+        if not links:
+            logging.warning(f'No {event_type} links on {response.url}')
+        logging.info(f'{event_type} links received')
+
+        return links
+
+    def iter_codes(self) -> Iterator[Tuple[str, str, str]]:
+        """
+        Gets all codes for the ballet and extras. Every code is yielded as
+        soon as it is classified and written to the code files, when the
+        department is done.
+        Yields:
+            Event type, action type and event code.
+        Raises:
+            DiscoveryError: if the site doesn't serve the codes without a
+                browser. A department without links is a month without its
+                events, but no links at all mean the links are rendered by JS.
+        """
+        for event_type in (BALLET, EXTRAS):
+            codes = {PERFS: set(), REHS: set()}
+            for action_type, code in self.__get_links(event_type):
+                if code not in codes[action_type]:
+                    codes[action_type].add(code)
+                    yield event_type, action_type, code
+
+            write_codes(event_type, codes[PERFS], codes[REHS], self.period)
+            logging.info(f'{event_type} codes received')
+
+        if not self.__links:
+            raise DiscoveryError(f'No event links of any department for {self.period.dates}')
@@ -0,0 +1,149 @@
+"""
+Webdriver fallback of the code discovery for the case, when the site
+doesn't serve the event links without a browser. Imported only when the
+fallback is needed, selenium is slow to import.
+"""
+
+import logging
+import re
+from typing import TYPE_CHECKING
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support import expected_conditions as ec
+from selenium.webdriver.support.ui import WebDriverWait
+
+import xpaths as xp
+from config import USERNAME, PASSWORD, URL_LOGIN
+from constants import PERIOD, BALLET, EXTRAS, PERFS, REHS
+from codes import write_codes
+from discovery import MENU_CODES, classify
+from period import Period
+
+if TYPE_CHECKING:
+    from participation import ParticipationStore
+
+
+class Driver:
+    """Webdriver fallback of discovery.HttpDiscovery."""
+
+    def __init__(self, period: Period = PERIOD, store: 'ParticipationStore' = None):
+        """
+        Args:
+            period: dates to discover the codes for
+            store: records the classification of every event, the skipped
+                ones included. Not recorded if None.
+        """
+        self.period = period
+        self.store = store
+        self.__driver: webdriver
+
+    # Shorten frequently used Webdriver methods for better readability
+    def __dfid(self, ID: str):
+        return self.__driver.find_element(By.ID, ID)
+
+    def __dfx(self, xpath: str):
+        return self.__driver.find_element(By.XPATH, xpath)
+
+    def __dfsx(self, xpath: str):
+        return self.__driver.find_elements(By.XPATH, xpath)
+
+    def __wdwid(self, ID: str, wait_time: int = 60):
+        WebDriverWait(self.__driver, wait_time).until(ec.presence_of_element_located((By.ID, ID)))
+
+    def __wait_links(self, old_link, wait_time: int = 60) -> None:
+        """
+        The url between ballet and extras does not change due to JS code, so
+        waits until the previous links are gone and the number of the new
+        links stops changing.
+        Args:
+            old_link: any link of the previous department or None
+        """
+        wait = WebDriverWait(self.__driver, wait_time, poll_frequency=0.5)
+        counts = []
+
+        def links_settled(driver) -> bool:
+            counts.append(len(driver.find_elements(By.XPATH, xp.links)))
+            return len(counts) > 1 and counts[-1] == counts[-2] > 0
+
+        try:
+            if old_link is not None:
+                wait.until(ec.staleness_of(old_link))
+            wait.until(links_settled)
+        except TimeoutException:
+            logging.warning(f'No new links in {wait_time} sec')
+
+    def __login(self) -> None:
+        """
+        Runs webdriver. Enters username and password. On the next page enters
+        start and final DATES.
+        """
+        date_len = 8  # DDMMYYYY
+        options = webdriver.FirefoxOptions()
+        options.set_preference("dom.webdriver.enabled", False)
+        self.__driver = webdriver.Firefox(options=options)
+        logging.info('Webdriver starts')
+        self.__driver.get(URL_LOGIN)
+        self.__wdwid(xp.username)
+        self.__dfid(xp.username).send_keys(USERNAME)
+        logging.info('Enters username')
+        self.__dfid(xp.password).send_keys(PASSWORD, Keys.ENTER)
+        logging.info('Enters password')
+        self.__wdwid(xp.start_date)
+
+        # Clear previous start date and enter a new one
+        date = self.__dfid(xp.start_date)
+        for _ in range(date_len):
+            date.send_keys(Keys.BACKSPACE)
+        date.send_keys(self.period.start_date)
+        logging.info('Enters start date')
+
+        # Clear previous final date and enter a new one
+        date = self.__dfid(xp.final_date)
+        for _ in range(date_len):
+            date.send_keys(Keys.BACKSPACE)
+        date.send_keys(self.period.final_date)
+        logging.info('Enters final date')
+
+    def __get_codes(self, event_type: str) -> None:
+        """
+        Gets unique event codes and writes them to 2 files with
+        corresponding names.
+        Click dropdown menu -> choose ballet or extras -> click 'Submit'
+        """
+        perfs_codes, rehs_codes, events = set(), set(), []
+        old_links = self.__dfsx(xp.links)
+        self.__dfx(xp.dropdown_menu).click()
+        self.__dfx(f"//li[@data-original-index='{MENU_CODES[event_type]}']").click()
+        self.__dfid(xp.submit).click()
+        logging.info(f'Choose {event_type} from menu')
+
+        self.__wait_links(old_links[0] if old_links else None)
+        links = self.__dfsx(xp.links)
+        for link in links:
+            code = re.search(r'\d+', link.get_attribute('href')).group()
+            title = link.text
+            action_type = classify(event_type, title)
+            events.append((code, action_type, title))
+            if action_type == PERFS:
+                perfs_codes.add(code)
+            elif action_type == REHS:
+                rehs_codes.add(code)
+        logging.info(f'{event_type} links received')
+
+        write_codes(event_type, perfs_codes, rehs_codes, self.period)
+        if self.store is not None:
+            self.store.put_events(self.period, event_type, events)
+
+    def get_all_codes(self) -> None:
+        """Gets all codes for the ballet and extras"""
+        self.__login()
+
+        for event_type in (BALLET, EXTRAS):
+            self.__get_codes(event_type)
+            logging.info(f'{event_type} codes received')
+
+        self.__driver.quit()
+        logging.info('Webdriver quits')
@@ -0,0 +1,39 @@
+"""
+Targeted extractor of the participants table. Streams the event page
+through lxml and keeps only the Role | Feature | Secure cells instead of
+building the whole document tree.
+"""
+
+from io import BytesIO
+from typing import List, Tuple
+
+from lxml import etree
+
+# Every cell of the participants table and only them have this inline style
+STYLE_TAG = 'padding-left: 5px; border: 1px solid gray;'
+
+
+def extract_rows(page: str) -> List[Tuple[str, str, str]]:
+    """
+    Extracts participants table from the event page.
+    Args:
+        page: html page of the event
+    Returns:
+        List of rows: Role | Feature | Secure. Empty for an empty page.
+    """
+    if not page.strip():
+        return []
+
+    cells = []
+    events = etree.iterparse(BytesIO(page.encode('utf-8')), events=('end',), tag='td',
+                             html=True, encoding='utf-8', recover=True)
+    for _, element in events:
+        if element.get('style') == STYLE_TAG:
+            cells.append(''.join(element.itertext()).strip())
+
+        # Drop parsed cells, so the tree never holds more than one row
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+    return list(zip(cells[0::3], cells[1::3], cells[2::3]))
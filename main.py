@@ -1,20 +1,10 @@
-from constants import MEN, WOMEN
-from parser import Driver, User, Data, BALLET, EXTRAS, PERFS, REHS
+import logging
 
-if __name__ == '__main__':
-    # Login via webdriver and collect all codes
-    Driver().get_all_codes()
-
-    user = User()
-    data = Data()
-    # Parse through events to get json
-    for event_type in (BALLET, EXTRAS):
+from constants import PERIOD
+from pipeline import run_period
+from transport import Transport
 
-        for action_type in (PERFS, REHS):
-            user.run_parser(event_type, action_type)
-
-        # Aggregate and convert json to csv. Write csv to xls
-        for gender in (MEN, WOMEN):
-            data.aggregate_to_csv(event_type, gender)
-            data.write_to_xls(event_type, gender)
-            data.write_to_db(event_type, gender)
\ No newline at end of file
+if __name__ == '__main__':
+    transport = Transport()
+    run_period(PERIOD, transport)
+    logging.info(f'Connections: {transport.stats()}')
@@ -0,0 +1,166 @@
+"""
+Manifest of the parsed event pages. Lets incremental runs skip the events,
+that were already counted by a previous run for the same period.
+Every parsed page is also appended to the journal next to the manifest, so
+a run, that was killed halfway, resumes from the last parsed page. save
+compacts the journal into the manifest.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import logging
+import time
+from typing import Dict, Optional, Set, Tuple, TextIO
+
+from config import INCREMENTAL_MAX_AGE
+from constants import MANIFEST_PATH
+from utils import create_parent_dir
+
+# Version of the entries. Entries without it were written, while error pages
+# of the site went to the manifest without any participants
+VERSION = 2
+
+
+class Manifest:
+    def __init__(self, path: str = MANIFEST_PATH, max_age: int = INCREMENTAL_MAX_AGE):
+        """
+        Args:
+            path: json file with the manifest. The journal is the .jsonl file
+                with the same name.
+            max_age: pages parsed earlier than max_age sec ago are checked
+                for changes. Pages of the journal of a killed run and of
+                this run are reused regardless of their age.
+        """
+        self.path, self.max_age = path, max_age
+        self.journal_path = os.path.splitext(path)[0] + '.jsonl'
+        self.reused, self.unchanged, self.parsed, self.replayed = 0, 0, 0, 0
+        self.__lock = threading.Lock()
+        self.__journal: Optional[TextIO] = None
+        self.__events: Dict[str, Dict] = {}
+        # Keys replayed from the journal or journaled by this run
+        self.__current: Set[str] = set()
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as file:
+                self.__events = json.load(file)
+        self.__replay()
+
+    def __replay(self) -> None:
+        """Applies the entries, that were journaled after the last save."""
+        if not os.path.isfile(self.journal_path):
+            return
+
+        with open(self.journal_path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    key, entry = json.loads(line)
+                except ValueError:
+                    # The last line may be cut off, if the run was killed
+                    logging.warning(f'Skipped broken line of {self.journal_path}')
+                    continue
+                self.__events[key] = entry
+                self.__current.add(key)
+                self.replayed += 1
+        if self.replayed:
+            logging.info(f'{self.replayed} parsed pages replayed from {self.journal_path}')
+
+    def __append(self, key: str, entry: Dict) -> None:
+        """
+        Appends the entry to the journal. Called under the lock. The line is
+        flushed to the OS, so it survives a killed process, but isn't synced
+        to the disk, so the fetch loop doesn't wait for it.
+        """
+        self.__current.add(key)
+        if self.__journal is None:
+            create_parent_dir(self.path)
+            self.__journal = open(self.journal_path, 'a', encoding='utf-8')
+        self.__journal.write(json.dumps((key, entry), ensure_ascii=False) + '\n')
+        self.__journal.flush()
+
+    @staticmethod
+    def page_hash(page: str) -> str:
+        return hashlib.sha1(page.encode('utf-8')).hexdigest()
+
+    def get(self, event_code: str, menu_code: str) -> Optional[Tuple[Set[str], Set[str]]]:
+        """
+        Returns:
+            Feature and secure participants of the page, if it was parsed
+            less than max_age sec ago or by this run or the killed run
+            before it, otherwise None. Pages without any participants of the
+            entries before VERSION are checked again, they might be error
+            pages of the site.
+        """
+        key = event_code + menu_code
+        entry = self.__events.get(key)
+        if entry is None or 'version' not in entry and not (entry['feat'] or entry['secure']):
+            return None
+        if key not in self.__current and time.time() - entry['checked'] > self.max_age:
+            return None
+        self.reused += 1
+
+        return set(entry['feat']), set(entry['secure'])
+
+    def participants(self, event_code: str, menu_code: str) -> Optional[Tuple[Set[str], Set[str]]]:
+        """
+        Returns:
+            Feature and secure participants of the page regardless of their
+            age or None, if the page wasn't parsed.
+        """
+        entry = self.__events.get(event_code + menu_code)
+        if entry is None:
+            return None
+
+        return set(entry['feat']), set(entry['secure'])
+
+    def get_unchanged(self, event_code: str, menu_code: str, page_hash: str
+                      ) -> Optional[Tuple[Set[str], Set[str]]]:
+        """
+        Returns:
+            Feature and secure participants of the page, if its hash didn't
+            change since it was parsed, otherwise None.
+        """
+        entry = self.__events.get(event_code + menu_code)
+        if entry is None or entry['hash'] != page_hash:
+            return None
+        with self.__lock:
+            entry['checked'] = time.time()
+            self.unchanged += 1
+            self.__append(event_code + menu_code, entry)
+
+        return set(entry['feat']), set(entry['secure'])
+
+    def put(self, event_code: str, menu_code: str, page_hash: str, feat: Set[str], secure: Set[str]) -> None:
+        """Stores participants of the newly parsed page."""
+        entry = {
+            'hash': page_hash, 'checked': time.time(), 'feat': sorted(feat), 'secure': sorted(secure),
+            'version': VERSION
+        }
+        with self.__lock:
+            self.__events[event_code + menu_code] = entry
+            self.parsed += 1
+            self.__append(event_code + menu_code, entry)
+
+    def save(self) -> None:
+        """
+        Replaces the manifest at once, so a killed run leaves either the old
+        or the new one, and empties the journal.
+        """
+        create_parent_dir(self.path)
+        with self.__lock:
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(self.__events, file, ensure_ascii=False)
+            os.replace(self.path + '.tmp', self.path)
+
+            if self.__journal is not None:
+                self.__journal.close()
+                self.__journal = None
+            if os.path.isfile(self.journal_path):
+                os.remove(self.journal_path)
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            Number of reused, unchanged, newly parsed and replayed pages.
+        """
+        return {'reused': self.reused, 'unchanged': self.unchanged, 'parsed': self.parsed, 'replayed': self.replayed}
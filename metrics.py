@@ -0,0 +1,150 @@
+"""
+Run metrics: latency histograms of the stages (login, discovery, fetching,
+parsing, counting and every output) and byte and event counters. Exported
+after every period as a json report and optionally in the Prometheus text
+format for the node exporter textfile collector.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterator, List
+
+from utils import create_parent_dir
+
+# Upper bounds of the histogram buckets, sec
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Prefix of the Prometheus metric names
+PREFIX = 'mariinsky_counter'
+
+
+class Histogram:
+    def __init__(self):
+        # Observations in every bucket and above the last one
+        self.buckets: List[int] = [0] * (len(BUCKETS) + 1)
+        self.count, self.sum = 0, 0.0
+        self.min, self.max = float('inf'), 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min, self.max = min(self.min, value), max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket of the quantile. Max for the last bucket."""
+        rank, seen = q * self.count, 0
+        for bound, number in zip(BUCKETS, self.buckets):
+            seen += number
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0,
+            'min': round(self.min, 6) if self.count else 0,
+            'max': round(self.max, 6),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': dict(zip([*map(str, BUCKETS), '+Inf'], self.buckets))
+        }
+
+
+class Metrics:
+    """Thread safe registry of the stage histograms and the counters."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.started = time.time()
+            self.stages: Dict[str, Histogram] = {}
+            self.counters: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.__lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """Adds value to the counter, e.g. to the number of the fetched bytes."""
+        with self.__lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Observes the wall time of the block, also if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def report(self, labels: Dict[str, str] = None) -> Dict:
+        with self.__lock:
+            return {
+                'labels': labels or {},
+                'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'seconds': round(time.time() - self.started, 3),
+                'stages': {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+                'counters': dict(self.counters)
+            }
+
+    def prometheus(self, labels: Dict[str, str] = None) -> str:
+        """Histograms and counters in the Prometheus text exposition format."""
+        def series(name: str, **extra) -> str:
+            pairs = {**(labels or {}), **extra}
+            return name + ('{' + ','.join(f'{key}="{value}"' for key, value in pairs.items()) + '}' if pairs else '')
+
+        lines = [f'# HELP {PREFIX}_stage_seconds Wall time of the stages of a run',
+                 f'# TYPE {PREFIX}_stage_seconds histogram']
+        with self.__lock:
+            for stage, histogram in self.stages.items():
+                cumulative = 0
+                for bound, number in zip([*map(str, BUCKETS), '+Inf'], histogram.buckets):
+                    cumulative += number
+                    lines.append(f'{series(f"{PREFIX}_stage_seconds_bucket", stage=stage, le=bound)} {cumulative}')
+                lines.append(f'{series(f"{PREFIX}_stage_seconds_sum", stage=stage)} {histogram.sum}')
+                lines.append(f'{series(f"{PREFIX}_stage_seconds_count", stage=stage)} {histogram.count}')
+
+            for counter, value in self.counters.items():
+                lines.append(f'# TYPE {PREFIX}_{counter}_total counter')
+                lines.append(f'{series(f"{PREFIX}_{counter}_total")} {value}')
+            lines.append(f'# TYPE {PREFIX}_last_run_timestamp_seconds gauge')
+            lines.append(f'{series(f"{PREFIX}_last_run_timestamp_seconds")} {self.started}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, labels: Dict[str, str] = None, prometheus: bool = False) -> None:
+        """
+        Writes the json report to path and the Prometheus text to the same
+        path with .prom extension.
+        """
+        create_parent_dir(path)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(labels), file, ensure_ascii=False, indent=4)
+        if prometheus:
+            # The textfile collector may read the file while it's written
+            prom_path = os.path.splitext(path)[0] + '.prom'
+            with open(prom_path + '.tmp', 'w', encoding='utf-8') as file:
+                file.write(self.prometheus(labels))
+            os.replace(prom_path + '.tmp', prom_path)
+
+
+@lru_cache
+def get_metrics() -> Metrics:
+    """Metrics of the process. Every module records to the same registry."""
+    return Metrics()
@@ -0,0 +1,190 @@
+"""
+Store of the participations of every parsed event: role, person and
+feature or secure, before the skip list of the roles is applied, and the
+classification of every discovered event, the skipped ones included. The
+reports are recounted from it under any skip list without going to the
+site. Kept in a single SQLite file shared by every run, like the page
+cache.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from aggregate import empty_listed
+from constants import STORE_PATH, FEAT, SECURE
+from period import Period
+from utils import compile_substrings, create_parent_dir, remove_brackets
+
+# Classification of the events, that discovery skips
+SKIP = 'skip'
+
+
+def split_rows(table: List[Tuple[str, str, str]]) -> Iterator[Tuple[str, str, str]]:
+    """
+    Splits the rows of an event page the same way as User does. Empty names
+    are left out, the counters skip them anyway.
+    Args:
+        table: list of rows: Role | Feature | Secure.
+    Yields:
+        Role, person and participation type.
+    """
+    for role, feat_column, secure_column in table:
+        for participation_type, column in ((FEAT, feat_column), (SECURE, secure_column)):
+            for person in set(map(remove_brackets, column.split(','))):
+                if person:
+                    yield role, person, participation_type
+
+
+class ParticipationStore:
+    def __init__(self, path: str = STORE_PATH):
+        """
+        Args:
+            path: SQLite file with the participations
+        """
+        create_parent_dir(path)
+
+        self.pages_written, self.events_written = 0, 0
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        # A page lost on a power cut is parsed again by the next run
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.executescript(
+            'CREATE TABLE IF NOT EXISTS events ('
+            'period TEXT, event_type TEXT, event_code TEXT, action_type TEXT, title TEXT, '
+            'PRIMARY KEY (period, event_type, event_code, action_type));'
+            'CREATE INDEX IF NOT EXISTS events_code ON events (event_code, event_type);'
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'event_code TEXT, event_type TEXT, parsed REAL, PRIMARY KEY (event_code, event_type));'
+            'CREATE TABLE IF NOT EXISTS participations ('
+            'event_code TEXT, event_type TEXT, role TEXT, person TEXT, participation_type TEXT);'
+            'CREATE INDEX IF NOT EXISTS participations_event ON participations (event_code, event_type);'
+            'CREATE INDEX IF NOT EXISTS participations_person ON participations (person);'
+        )
+
+    def put_events(self, period: Period, event_type: str, events: Iterable[Tuple[str, Optional[str], str]]) -> None:
+        """
+        Replaces the discovered events of the department in the period.
+        Args:
+            events: event code, action type or None, if the event is
+                skipped, and the link text
+        """
+        rows = [
+            (period.dates, event_type, event_code, action_type or SKIP, title)
+            for event_code, action_type, title in events
+        ]
+        with self.__lock:
+            self.__transaction(
+                ('DELETE FROM events WHERE period = ? AND event_type = ?', [(period.dates, event_type)]),
+                ('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)', rows)
+            )
+            self.events_written += len(rows)
+
+    def put_page(self, event_code: str, event_type: str, table: List[Tuple[str, str, str]]) -> None:
+        """
+        Replaces the participations of the parsed page. Thread safe.
+        Args:
+            table: list of rows: Role | Feature | Secure.
+        """
+        rows = [(event_code, event_type, *participation) for participation in split_rows(table)]
+        with self.__lock:
+            self.__transaction(
+                ('DELETE FROM participations WHERE event_code = ? AND event_type = ?', [(event_code, event_type)]),
+                ('INSERT INTO participations VALUES (?, ?, ?, ?, ?)', rows),
+                ('INSERT OR REPLACE INTO pages VALUES (?, ?, ?)', [(event_code, event_type, time.time())])
+            )
+            self.pages_written += 1
+
+    def __transaction(self, *statements: Tuple[str, List[Tuple]]) -> None:
+        """
+        Runs the statements with their rows in one transaction. Rolls it back,
+        if any fails, e.g. on a full disk, so the connection stays usable.
+        """
+        self.__connection.execute('BEGIN')
+        try:
+            for statement, rows in statements:
+                self.__connection.executemany(statement, rows)
+            self.__connection.execute('COMMIT')
+        except BaseException:
+            if self.__connection.in_transaction:
+                self.__connection.execute('ROLLBACK')
+            raise
+
+    def has_page(self, event_code: str, event_type: str) -> bool:
+        with self.__lock:
+            return self.__connection.execute(
+                'SELECT 1 FROM pages WHERE event_code = ? AND event_type = ?', (event_code, event_type)
+            ).fetchone() is not None
+
+    def listed(self, period: Period) -> Dict[Tuple[str, str], Set[str]]:
+        """
+        Returns:
+            (event type, action type) -> event codes of the period, that
+            aren't skipped.
+        """
+        listed = empty_listed()
+        with self.__lock:
+            rows = self.__connection.execute(
+                'SELECT event_type, action_type, event_code FROM events WHERE period = ? AND action_type != ?',
+                (period.dates, SKIP)
+            ).fetchall()
+        for event_type, action_type, event_code in rows:
+            listed[(event_type, action_type)].add(event_code)
+
+        return listed
+
+    def pages(self, period: Period, skip_roles: Tuple[str, ...]
+              ) -> Dict[Tuple[str, str], Tuple[Set[str], Set[str]]]:
+        """
+        Distributes the participants of the stored pages of the period like
+        User does, but skips the roles of skip_roles.
+        Returns:
+            (event code, event type) -> feature and secure participants of
+            the page. Pages, that weren't parsed yet, are missing.
+        """
+        with self.__lock:
+            parsed = self.__connection.execute(
+                'SELECT DISTINCT p.event_code, p.event_type FROM pages p JOIN events e '
+                'ON e.event_code = p.event_code AND e.event_type = p.event_type '
+                'WHERE e.period = ? AND e.action_type != ?', (period.dates, SKIP)
+            ).fetchall()
+            rows = self.__connection.execute(
+                'SELECT p.event_code, p.event_type, p.role, p.person, p.participation_type FROM participations p '
+                'WHERE EXISTS (SELECT 1 FROM events e WHERE e.event_code = p.event_code '
+                'AND e.event_type = p.event_type AND e.period = ? AND e.action_type != ?)', (period.dates, SKIP)
+            ).fetchall()
+
+        pages = {page: (set(), set()) for page in parsed}
+        # The same few hundred roles repeat in every event, so each is checked once
+        pattern = compile_substrings(skip_roles) if skip_roles else None
+        skipped: Dict[str, bool] = {}
+        for event_code, event_type, role, person, participation_type in rows:
+            if role not in skipped:
+                skipped[role] = pattern is not None and pattern.search(role) is not None
+            if not skipped[role]:
+                pages[(event_code, event_type)][participation_type == SECURE].add(person)
+
+        return pages
+
+    def person(self, person: str, period: Period) -> List[Tuple[str, str, str, str, str]]:
+        """
+        Returns:
+            Every stored participation of the person in the events of the
+            period: event type, event code, action type, role and
+            participation type.
+        """
+        with self.__lock:
+            return self.__connection.execute(
+                'SELECT DISTINCT e.event_type, e.event_code, e.action_type, p.role, p.participation_type '
+                'FROM participations p JOIN events e ON e.event_code = p.event_code AND e.event_type = p.event_type '
+                'WHERE p.person = ? AND e.period = ? ORDER BY e.event_type, e.event_code', (person, period.dates)
+            ).fetchall()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Number of pages and events written by the run.
+        """
+        return {'pages': self.pages_written, 'events': self.events_written}
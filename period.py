@@ -0,0 +1,73 @@
+"""
+Reporting period. Every period has its own codes, outputs and database
+table, so several periods can be processed side by side.
+"""
+
+from datetime import datetime
+from typing import List
+
+from utils import validate_dates, create_period
+
+
+class Period:
+    def __init__(self, start_date: str, final_date: str, year: int = None, month: int = None):
+        """
+        Args:
+            start_date, final_date: dates in format DD.MM.YYYY
+            year, month: name of the database table. Month of the start date
+                if None.
+        """
+        if not validate_dates(start_date, final_date):
+            raise ValueError("Final date shouldn't be earlier than the start date")
+
+        start = datetime.strptime(start_date, '%d.%m.%Y')
+        self.start_date, self.final_date = start_date, final_date
+        self.year = year or start.year
+        self.month = month or start.month
+        self.dates = start_date + '-' + final_date
+
+        # Paths
+        self.codes_path = f'./data/{self.dates}/codes/'
+        self.json_path = f'./data/{self.dates}/json/'
+        self.csv_path = f'./data/{self.dates}/csv/'
+        self.xls_path = f'./data/{self.dates}/xls/'
+        self.manifest_path = f'./data/{self.dates}/manifest.json'
+        self.metrics_path = f'./data/{self.dates}/metrics.json'
+
+    @property
+    def table_name(self) -> str:
+        return f'{self.year}_{self.month}'
+
+    @property
+    def key(self) -> str:
+        """
+        Period of the reports table, YYYY-MM of the start date, sorts in time
+        order. Unlike the table name, it doesn't depend on the year and month
+        of config.
+        """
+        start = datetime.strptime(self.start_date, '%d.%m.%Y')
+        return f'{start.year}-{start.month:02}'
+
+    @classmethod
+    def of_month(cls, month: int, year: int) -> 'Period':
+        """The whole month."""
+        return cls(*create_period(month, year).split('-'))
+
+    @classmethod
+    def months(cls, start: str, final: str) -> List['Period']:
+        """
+        Every month from start to final inclusive.
+        Args:
+            start, final: months in format MM.YYYY
+        """
+        month, year = map(int, start.split('.'))
+        final_month, final_year = map(int, final.split('.'))
+        periods = []
+        while (year, month) <= (final_year, final_month):
+            periods.append(cls.of_month(month, year))
+            month, year = (1, year + 1) if month == 12 else (month + 1, year)
+
+        return periods
+
+    def __repr__(self) -> str:
+        return f'Period({self.dates})'
@@ -0,0 +1,255 @@
+"""
+Streaming pipeline from the code discovery to the counting. Codes go to the
+fetch workers as soon as they are classified, so discovery overlaps with
+fetching. Every event page is fetched once and routed to every report,
+that needs it.
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Set, Tuple
+
+from aggregate import Aggregate, Listed, empty_listed
+from cache import PageCache
+from codes import read_codes
+from config import WORKERS, INCREMENTAL, INCREMENTAL_MAX_AGE, DEBUG_OUTPUTS, METRICS_PROMETHEUS
+from constants import PERIOD, BALLET, EXTRAS, PERFS, REHS, BAR_FORMAT
+from manifest import Manifest
+from metrics import get_metrics
+from parser import PAGE_CODES, SKIP_ROLES, User
+from participation import ParticipationStore
+from period import Period
+from sinks import JsonSink, CsvSink, XlsSink, DbSink
+from workqueue import WorkQueue
+
+# requests, lxml.html of discovery and tqdm are slow to import, they are
+# imported by the functions, that go to the site. The steps, that count the
+# reports offline, don't need them
+if TYPE_CHECKING:
+    from transport import Transport
+
+# (event code, event type) -> feature and secure participants of the page
+Pages = Dict[Tuple[str, str], Tuple[Set[str], Set[str]]]
+
+
+class PageMissing(Exception):
+    """The manifest has no participants of a page of the discovered codes."""
+
+
+class CodesMissing(Exception):
+    """No codes of the period were discovered into the store or the queue."""
+
+
+def discover_codes(transport: 'Transport', period: Period = PERIOD, store: ParticipationStore = None
+                   ) -> Iterator[Tuple[str, str, str]]:
+    """
+    Discovers codes over HTTP. Collects them via webdriver, if the site
+    doesn't serve them without a browser.
+    Args:
+        store: records the classification of every event. Not recorded if None.
+    Yields:
+        Event type, action type and event code.
+    """
+    from discovery import HttpDiscovery, DiscoveryError
+
+    try:
+        yield from HttpDiscovery(transport, period, store).iter_codes()
+    except DiscoveryError as error:
+        logging.warning(f'{error}. Falling back to webdriver')
+        from driver import Driver
+        Driver(period, store).get_all_codes()
+        yield from read_codes(period)
+
+
+class Pipeline:
+    def __init__(self, user: User, workers: int = WORKERS):
+        """
+        Args:
+            user: parses event pages in the worker threads
+            workers: number of event pages fetched at once
+        """
+        self.user = user
+        self.workers = workers
+
+    def run(self, codes: Iterable[Tuple[str, str, str]]) -> Aggregate:
+        """
+        Fetches, parses and counts the pages of the codes.
+        Args:
+            codes: event type, action type and event code from discovery
+        Returns:
+            Counters of all the reports.
+        """
+        return self.count(*self.fetch(codes))
+
+    def fetch(self, codes: Iterable[Tuple[str, str, str]]) -> Tuple[Listed, Pages]:
+        """
+        Fetches and parses the pages of the codes, while they are discovered.
+        Every page is fetched once, even if it's listed in several reports.
+        Args:
+            codes: event type, action type and event code from discovery
+        Returns:
+            Listed codes and participants of their pages.
+        """
+        from tqdm import tqdm
+
+        listed = empty_listed()
+        futures: Dict[Tuple[str, str], Future] = {}
+
+        with tqdm(total=0, desc='events', bar_format=BAR_FORMAT, dynamic_ncols=True) as progress, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for event_type, action_type, event_code in codes:
+                listed[(event_type, action_type)].add(event_code)
+                if (event_code, event_type) in futures:
+                    continue
+
+                future = executor.submit(self.user.parse_page, event_code, event_type)
+                future.add_done_callback(lambda _: progress.update())
+                futures[(event_code, event_type)] = future
+                progress.total += 1
+                progress.refresh()
+
+        pages = {page: future.result() for page, future in futures.items()}
+        get_metrics().count('pages', len(pages))
+
+        return listed, pages
+
+    @staticmethod
+    def count(listed: Listed, pages: Pages) -> Aggregate:
+        """
+        For the ballet reports we need both ballet and extras pages. For the
+        extras reports we need only extras pages.
+        Returns:
+            Counters of all the reports.
+        """
+        aggregate = Aggregate()
+        with get_metrics().timer('count'):
+            for action_type in (PERFS, REHS):
+                ballet_codes, extras_codes = listed[(BALLET, action_type)], listed[(EXTRAS, action_type)]
+                aggregate.add(BALLET, action_type, *User.count_events(
+                    User.ballet_events(ballet_codes, extras_codes), pages
+                ))
+                aggregate.add(EXTRAS, action_type, *User.count_events(
+                    {event_code: (EXTRAS,) for event_code in extras_codes}, pages
+                ))
+
+        return aggregate
+
+
+def recount(period: Period = PERIOD) -> Aggregate:
+    """
+    Counts all the reports from the code files and the participants, that
+    the manifest recorded for their pages, without going to the site.
+    Raises:
+        PageMissing: if a page wasn't fetched yet.
+    """
+    manifest = Manifest(period.manifest_path)
+    listed, pages = empty_listed(), {}
+    for event_type, action_type, event_code in read_codes(period):
+        listed[(event_type, action_type)].add(event_code)
+        if (event_code, event_type) not in pages:
+            participants = manifest.participants(event_code, PAGE_CODES[event_type])
+            if participants is None:
+                raise PageMissing(f'{period.dates}: {event_type} event {event_code} is not in the manifest')
+            pages[(event_code, event_type)] = participants
+
+    return Pipeline.count(listed, pages)
+
+
+def rederive(period: Period = PERIOD, skip_roles: Tuple[str, ...] = SKIP_ROLES, store: ParticipationStore = None
+             ) -> Aggregate:
+    """
+    Counts all the reports from the events and the participations, that the
+    store recorded, without going to the site. Unlike recount, the roles
+    are skipped by skip_roles instead of the list, the pages were parsed
+    with.
+    Args:
+        store: the store of constants.STORE_PATH if None
+    Raises:
+        CodesMissing: if the store has no codes of the period.
+        PageMissing: if a page wasn't parsed into the store yet.
+    """
+    store = store or ParticipationStore()
+    with get_metrics().timer('rederive'):
+        listed, pages = store.listed(period), store.pages(period, skip_roles)
+    if not any(listed.values()):
+        raise CodesMissing(f'{period.dates}: no codes in the store')
+    check_pages(listed, pages)
+
+    return Pipeline.count(listed, pages)
+
+
+def collect(period: Period = PERIOD, queue: WorkQueue = None) -> Aggregate:
+    """
+    Counts all the reports from the results, that the workers pushed to the
+    work queue.
+    Args:
+        queue: the queue of constants.QUEUE_PATH if None
+    Raises:
+        CodesMissing: if no codes of the period were queued.
+        PageMissing: if a page isn't done yet.
+    """
+    queue = queue or WorkQueue()
+    listed, pages = queue.results(period)
+    if not any(listed.values()):
+        raise CodesMissing(f'{period.dates}: no codes in the queue')
+    check_pages(listed, pages)
+
+    return Pipeline.count(listed, pages)
+
+
+def check_pages(listed: Listed, pages: Pages) -> None:
+    """
+    Raises:
+        PageMissing: if any page of the listed codes has no participants.
+    """
+    for (event_type, _), event_codes in listed.items():
+        for event_code in event_codes:
+            if (event_code, event_type) not in pages:
+                raise PageMissing(f'{event_type} event {event_code} is not parsed')
+
+
+def run_period(period: Period, transport: 'Transport', database_url: str = None) -> None:
+    """
+    Discovers, fetches and counts all the events of the period and writes
+    every output. Writes the metrics of the run next to the outputs.
+    Args:
+        database_url: database of the db output. The one of the config if None.
+    Raises:
+        CodesMissing: if no codes were discovered. Nothing is written, empty
+            outputs would replace the reports of the period.
+    """
+    metrics = get_metrics()
+    cache = PageCache()
+    # Non-incremental runs refetch every page, but the ones of the journal of
+    # a killed run, and still record the manifest for the next incremental run
+    manifest = Manifest(period.manifest_path, max_age=INCREMENTAL_MAX_AGE if INCREMENTAL else 0)
+    store = ParticipationStore()
+    user = User(transport, cache, manifest, store)
+
+    # Fetch and parse events, while the codes are being discovered. Count
+    # all the reports in memory
+    with metrics.timer('pipeline'):
+        listed, pages = Pipeline(user).fetch(discover_codes(transport, period, store))
+        manifest.save()
+    if not any(listed.values()):
+        metrics.reset()
+        raise CodesMissing(f'{period.dates}: no codes discovered, nothing is written')
+    aggregate = Pipeline.count(listed, pages)
+
+    # Write the aggregate to csv, xls and db. Json files are only needed
+    # for debugging
+    sinks = [CsvSink(period), XlsSink(period), DbSink(period, database_url)]
+    if DEBUG_OUTPUTS:
+        sinks.insert(0, JsonSink(period))
+    for sink in sinks:
+        with metrics.timer(f'write_{sink.name}'):
+            sink.write(aggregate)
+
+    logging.info(f'{period.dates} page cache: {cache.stats()}')
+    logging.info(f'{period.dates} manifest: {manifest.stats()}')
+    logging.info(f'{period.dates} participations: {store.stats()}')
+
+    # Login of the run before the period also goes to its metrics
+    metrics.write(period.metrics_path, {'period': period.table_name}, METRICS_PROMETHEUS)
+    metrics.reset()
+    logging.info(f'{period.dates} metrics: {period.metrics_path}')
@@ -0,0 +1,88 @@
+"""
+Queries of the reports of all the periods in the database: history of a
+name, totals of the departments and rankings. migrate copies the tables of
+the periods, that were written before the reports table, into it.
+Usage:
+    python query.py history NAME [--start MM.YYYY --final MM.YYYY]
+    python query.py totals [--department ballet|extras]
+    python query.py top [N] [--by COUNTER] [--department ballet|extras] [--gender men|women]
+    python query.py migrate [--overwrite]
+Every command takes --url of the database, the database of config if not set.
+"""
+
+import argparse
+import logging
+from typing import Iterable, Sequence
+
+from constants import BALLET, EXTRAS, MEN, WOMEN
+from db.db import get_engine
+from db.reports import RANKINGS, history, migrate_months, top, totals
+
+
+def month(value: str) -> str:
+    """MM.YYYY -> YYYY-MM of the reports table."""
+    try:
+        month_number, year = map(int, value.split('.'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value} is not in format MM.YYYY')
+    if not 1 <= month_number <= 12:
+        raise argparse.ArgumentTypeError(f'{value} has no month {month_number}')
+
+    return f'{year}-{month_number:02}'
+
+
+def print_rows(header: Sequence[str], rows: Iterable[Sequence]) -> None:
+    for row in (header, *rows):
+        print(''.join(f'{str(value):<{24 if index == 0 else 14}}' for index, value in enumerate(row)).rstrip())
+
+
+def main() -> None:
+    logging.basicConfig(
+        format='%(asctime)s - %(message)s',
+        datefmt='%d-%b-%y %H:%M:%S',
+        level=logging.INFO
+    )
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    history_parser = subparsers.add_parser('history', help='counters of the name in every period')
+    history_parser.add_argument('name', help='name as in the staff list')
+    totals_parser = subparsers.add_parser('totals', help='sums of the counters of the departments in every period')
+    top_parser = subparsers.add_parser('top', help='names with the largest counters over the periods')
+    top_parser.add_argument('limit', type=int, nargs='?', default=10, help='number of names')
+    top_parser.add_argument('--by', choices=RANKINGS, default='total', help='counters to sum up')
+    top_parser.add_argument('--gender', choices=(MEN, WOMEN))
+    migrate_parser = subparsers.add_parser('migrate', help='copy the tables of the periods to the reports table')
+    migrate_parser.add_argument('--overwrite', action='store_true',
+                                help='replace the periods, that are already in the reports table')
+
+    for subparser in (history_parser, totals_parser, top_parser, migrate_parser):
+        subparser.add_argument('--url', help='database url, the database of config if not set')
+        if subparser is not migrate_parser:
+            subparser.add_argument('--start', type=month, help='first month, MM.YYYY')
+            subparser.add_argument('--final', type=month, help='last month, MM.YYYY')
+        if subparser in (totals_parser, top_parser):
+            subparser.add_argument('--department', choices=(BALLET, EXTRAS))
+    args = arg_parser.parse_args()
+
+    engine = get_engine() if args.url is None else get_engine(args.url)
+    if args.command == 'migrate':
+        with engine.begin() as connection:
+            logging.info(f'Migrated: {migrate_months(connection, overwrite=args.overwrite)}')
+        return
+
+    with engine.connect() as connection:
+        if args.command == 'history':
+            rows = history(connection, args.name, args.start, args.final)
+        elif args.command == 'totals':
+            rows = totals(connection, args.start, args.final, args.department)
+        else:
+            rows = top(connection, args.limit, args.by, args.start, args.final, args.department, args.gender)
+    if rows:
+        print_rows(rows[0]._fields, rows)
+    else:
+        logging.info('Nothing found')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Adaptive rate limit of the requests to the corporate site. A token bucket
+shared by all the fetch threads of a transport. The rate grows additively
+while the site answers fast and falls multiplicatively on slow answers,
+errors and throttling (AIMD), within the bounds of config.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict
+
+from config import RATE, RATE_MIN, RATE_MAX, RATE_BURST, TARGET_LATENCY
+from metrics import get_metrics
+
+# Statuses, that mean the site is overloaded or limits us
+THROTTLE_STATUSES = {429, 502, 503, 504}
+
+# Factor of the rate on slow answers and errors and its growth per sec of
+# fast answers, req/sec
+DECREASE = 0.5
+INCREASE = 0.5
+
+# The current rate is logged not more often, sec
+LOG_INTERVAL = 10
+
+
+class RateLimiter:
+    def __init__(self, rate: float = RATE, min_rate: float = RATE_MIN, max_rate: float = RATE_MAX,
+                 burst: int = RATE_BURST, target_latency: float = TARGET_LATENCY):
+        """
+        Args:
+            rate: initial rate, requests per sec
+            min_rate, max_rate: bounds of the rate
+            burst: max number of requests sent at once after a pause
+            target_latency: answers slower than this, sec, slow the rate down
+        """
+        self.min_rate, self.max_rate = min_rate, max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.burst = burst
+        self.target_latency = target_latency
+        self.increases, self.decreases = 0, 0
+
+        self.__lock = threading.Lock()
+        self.__tokens = float(burst)
+        self.__updated = time.monotonic()
+        # The rate falls once per the time of the slowest answer, so answers
+        # of the requests, that were sent at once, don't drop it to the bottom
+        self.__decreased = 0.0
+        self.__logged = self.__updated
+
+    def acquire(self) -> None:
+        """Waits for a token. Tokens are reserved in order, so waiting threads don't starve."""
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate) - 1
+            self.__updated = now
+            wait = -self.__tokens / self.rate if self.__tokens < 0 else 0
+
+        if wait:
+            with get_metrics().timer('throttle'):
+                time.sleep(wait)
+
+    def record(self, latency: float, status: int = None, retries: int = 0) -> None:
+        """
+        Adapts the rate to the answer.
+        Args:
+            latency: time of the request with the retries, sec
+            status: status of the answer, None if the request failed
+                without one, e.g. timed out
+            retries: number of the retries of the request
+        """
+        with self.__lock:
+            now = time.monotonic()
+            if status is None:
+                self.__decrease(now, latency, 'no answer')
+            elif status in THROTTLE_STATUSES or retries:
+                self.__decrease(now, latency, f'status {status}, {retries} retries')
+            elif latency > self.target_latency:
+                self.__decrease(now, latency, f'latency {latency:.2f} sec')
+            elif status < 400:
+                # rate answers per sec, so the rate grows by INCREASE per sec
+                self.rate = min(self.max_rate, self.rate + INCREASE / self.rate)
+                self.increases += 1
+
+            if now - self.__logged >= LOG_INTERVAL:
+                self.__logged = now
+                logging.info(f'Rate limit {self.rate:.2f} req/sec')
+
+    def __decrease(self, now: float, latency: float, reason: str) -> None:
+        if now - self.__decreased < latency:
+            return
+
+        rate = max(self.min_rate, self.rate * DECREASE)
+        if rate != self.rate:
+            logging.info(f'Rate limit {self.rate:.2f} -> {rate:.2f} req/sec: {reason}')
+        self.rate, self.__decreased = rate, now
+        self.decreases += 1
+        get_metrics().count('rate_decreases')
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Current rate, number of increases and decreases.
+        """
+        return {'rate': round(self.rate, 2), 'increases': self.increases, 'decreases': self.decreases}
@@ -0,0 +1,179 @@
+"""
+Sinks of the aggregate. Every sink serializes all the report tables of an
+Aggregate at once: json (debug output), csv, xls and db. SQLAlchemy is
+imported by the sink, that needs it.
+"""
+
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Tuple
+
+from aggregate import Aggregate, COLUMNS, TABLES
+from config import XLS_COMBINED, DB_MONTH_TABLES
+from constants import PERIOD, WORKBOOK_PATH, BALLET, EXTRAS
+from period import Period
+from xlsx import Template
+
+# Rows of every table: event type and gender -> rows
+Tables = Iterable[Tuple[Tuple[str, str], List[List]]]
+
+
+class Sink(ABC):
+    # Name of the output in the metrics
+    name = None
+
+    def __init__(self, period: Period = PERIOD):
+        """
+        Args:
+            period: period of the aggregate. Defines paths and db table.
+        """
+        self.period = period
+
+    @abstractmethod
+    def write(self, aggregate: Aggregate) -> None:
+        """Writes all the reports of the aggregate."""
+
+
+class TableSink(Sink):
+    """Sink, that writes every report table of TABLES separately."""
+
+    def write(self, aggregate: Aggregate) -> None:
+        for event_type, gender in TABLES:
+            self.write_table(event_type, gender, aggregate.rows(event_type, gender))
+
+    @abstractmethod
+    def write_table(self, event_type: str, gender: str, rows: List[List]) -> None:
+        """Writes rows of the report table: name and 4 counters."""
+
+
+class JsonSink(Sink):
+    """Intermediate json files of the counters of every report column."""
+    name = 'json'
+
+    def write(self, aggregate: Aggregate) -> None:
+        json_path = self.period.json_path
+        if not os.path.isdir(json_path):
+            os.makedirs(json_path)
+
+        for event_type in (BALLET, EXTRAS):
+            for action_type, participation_type in COLUMNS:
+                json_file = f'{json_path}{event_type}_{participation_type}_{action_type}.json'
+                with open(json_file, 'w', encoding='utf-8') as file:
+                    json.dump(aggregate.table(event_type, action_type, participation_type),
+                              file, indent=4, ensure_ascii=False)
+
+
+class CsvSink(TableSink):
+    name = 'csv'
+
+    def csv_file(self, event_type: str, gender: str) -> str:
+        return f'{self.period.csv_path}{event_type}_{gender}_{self.period.dates}.csv'
+
+    def write_table(self, event_type: str, gender: str, rows: List[List]) -> None:
+        if not os.path.isdir(self.period.csv_path):
+            os.makedirs(self.period.csv_path)
+        with open(self.csv_file(event_type, gender), 'w', encoding='utf-8', newline='\n') as file:
+            csv.writer(file).writerows(rows)
+
+    def read_table(self, event_type: str, gender: str) -> List[List]:
+        with open(self.csv_file(event_type, gender), encoding='utf-8', newline='\n') as file:
+            return list(csv.reader(file))
+
+
+class XlsSink(TableSink):
+    name = 'xls'
+    # Index of the start row, that contains data in all the documents
+    start_row = 11
+
+    def __init__(self, period: Period = PERIOD, combined: bool = XLS_COMBINED):
+        """
+        Args:
+            period: period of the aggregate. Defines paths and db table.
+            combined: write all the tables to one workbook as separate sheets
+        """
+        super().__init__(period)
+        self.combined = combined
+        self.__template = None
+
+    @property
+    def template(self) -> Template:
+        """The template is read once, every report is written to a copy of its sheet."""
+        if self.__template is None:
+            self.__template = Template(WORKBOOK_PATH, self.start_row)
+
+        return self.__template
+
+    def __save(self, file_name: str, sheets: List[Tuple[str, bytes]]) -> None:
+        if not os.path.isdir(self.period.xls_path):
+            os.makedirs(self.period.xls_path)
+        self.template.save(f'{self.period.xls_path}{file_name}_{self.period.dates}.xlsx', sheets)
+
+    def write_table(self, event_type: str, gender: str, rows: List[List]) -> None:
+        """Writes rows with numeric counters and the formula of the sum to the xls template."""
+        title = f'{event_type}_{gender}'
+        self.__save(title, [(title, self.template.sheet(self.period.dates, rows))])
+
+    def write(self, aggregate: Aggregate) -> None:
+        self.write_tables((table, aggregate.rows(*table)) for table in TABLES)
+
+    def write_tables(self, tables: Tables) -> None:
+        """Writes every table to its own workbook or all to one, if combined."""
+        if not self.combined:
+            for (event_type, gender), rows in tables:
+                self.write_table(event_type, gender, rows)
+            return
+
+        sheets = [
+            (f'{event_type}_{gender}', self.template.sheet(self.period.dates, rows))
+            for (event_type, gender), rows in tables
+        ]
+        self.__save('report', sheets)
+
+
+class DbSink(TableSink):
+    name = 'db'
+
+    def __init__(self, period: Period = PERIOD, url: str = None):
+        """
+        Args:
+            period: period of the aggregate. Defines paths and db table.
+            url: database url. The database of config if None.
+        """
+        super().__init__(period)
+        self.url = url
+
+    def write(self, aggregate: Aggregate) -> None:
+        self.write_tables((table, aggregate.rows(*table)) for table in TABLES)
+
+    def write_table(self, event_type: str, gender: str, rows: List[List]) -> None:
+        self.write_tables((((event_type, gender), rows),))
+
+    def write_tables(self, tables: Tables) -> None:
+        """
+        Writes rows of every table to the reports table and to the table of
+        the period in one transaction. The report tables of the period are
+        replaced, rows of the names, that are already in the table of the
+        period, are updated.
+        """
+        from db.db import COUNTERS, MonthTable, Report, get_engine, get_table, record_month_table, replace_reports, \
+            upsert_books
+
+        # A name may be written only once per statement of the period table
+        books, reports = {}, {}
+        for table, rows in tables:
+            reports[table] = [{'name': name, **dict(zip(COUNTERS, map(int, counters)))} for name, *counters in rows]
+            books.update((book['name'], book) for book in reports[table])
+
+        engine = get_engine() if self.url is None else get_engine(self.url)
+        with engine.begin() as connection:
+            Report.__table__.create(connection, checkfirst=True)
+            replace_reports(connection, self.period.key, reports)
+            if DB_MONTH_TABLES:
+                table = get_table(self.period.table_name)
+                table.create(connection, checkfirst=True)
+                upsert_books(connection, list(books.values()), table)
+                # migrate_months skips the table, its rows are in the reports table
+                MonthTable.__table__.create(connection, checkfirst=True)
+                record_month_table(connection, self.period.table_name, self.period.key)
@@ -0,0 +1,164 @@
+"""
+HTTP transport shared by every request to the corporate site. Keeps
+connections alive in a pool, retries transient failures with backoff,
+paces the requests with the adaptive rate limit and logs in again when the
+session expires.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import xpaths as xp
+from config import USERNAME, PASSWORD, URL_LOGIN, URL_EVENT, WORKERS, RETRIES, BACKOFF, TIMEOUT
+from metrics import get_metrics
+from ratelimit import RateLimiter
+
+
+class SessionExpired(Exception):
+    """The site still answers with the login page after logging in again."""
+
+
+class AccountNotSet(Exception):
+    """The account environment variables aren't set."""
+
+
+class Transport:
+    def __init__(self, pool_size: int = WORKERS + 1, state: Dict = None, limiter: RateLimiter = None):
+        """
+        Args:
+            pool_size: max number of keep-alive connections to the site. One
+                more than WORKERS for discovery running next to the workers.
+            state: state() of a logged in transport, e.g. of another process.
+                Logs in if None.
+            limiter: rate limit of all the requests of the transport. The
+                bounds of config if None.
+        """
+        self.limiter = limiter or RateLimiter()
+        retry = Retry(
+            total=RETRIES,
+            backoff_factor=BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,  # The site serves event tables via POST
+            raise_on_status=False
+        )
+        self.__adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', self.__adapter)
+        self.session.mount('https://', self.__adapter)
+
+        # Every login increments the generation, so threads that noticed the
+        # same expired session log in only once.
+        self.__lock = threading.Lock()
+        self.__generation = 0
+        if state is None:
+            self.login()
+        else:
+            self.session.cookies.update(state['cookies'])
+            self.home_url = state['home_url']
+
+    def login(self) -> None:
+        """
+        Login via requests. Remembers the page the site redirects to.
+        Raises:
+            AccountNotSet: if any of the account environment variables isn't set.
+        """
+        if not all((USERNAME, PASSWORD, URL_LOGIN, URL_EVENT)):
+            raise AccountNotSet('Set username, password, url_login and url_event environment variables')
+        with get_metrics().timer('login'):
+            response = self.session.post(URL_LOGIN, {'UserName': USERNAME, 'Password': PASSWORD})
+        self.home_url = response.url
+        self.__generation += 1
+        logging.info('Session received')
+
+    def state(self) -> Dict:
+        """Cookies and home url to share the login with other processes."""
+        return {'cookies': self.session.cookies.get_dict(), 'home_url': self.home_url}
+
+    def get(self, url: str, params: Dict = None) -> requests.Response:
+        return self.__request('GET', url, params=params)
+
+    def post(self, url: str, data: Dict = None) -> requests.Response:
+        return self.__request('POST', url, data=data)
+
+    def __request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends request with the session cookies. Logs in again once, if the
+        session has expired.
+        Raises:
+            SessionExpired: if the site still returns the login page.
+        """
+        generation = self.__generation
+        response = self.__send(method, url, **kwargs)
+        if not self.__is_expired(response):
+            return response
+
+        with self.__lock:
+            if generation == self.__generation:
+                logging.info('Session expired')
+                self.login()
+        response = self.__send(method, url, **kwargs)
+        if self.__is_expired(response):
+            raise SessionExpired(url)
+
+        return response
+
+    def __send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends request, when the rate limit allows, and adapts the limit to the
+        answer or to the failure. Times the request with the retries and counts
+        the received bytes.
+        """
+        metrics = get_metrics()
+        self.limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=TIMEOUT, **kwargs)
+        except Exception:
+            # Timeouts and refused connections, that outlasted the retries,
+            # slow the rate down like errors of the site
+            self.limiter.record(time.perf_counter() - start)
+            metrics.count('failed_requests')
+            raise
+        latency = time.perf_counter() - start
+        retries = response.raw.retries
+        self.limiter.record(latency, response.status_code, len(retries.history) if retries else 0)
+        metrics.observe('request', latency)
+        metrics.count('requests')
+        metrics.count('response_bytes', len(response.content))
+        if not response.ok:
+            metrics.count('failed_requests')
+
+        return response
+
+    @staticmethod
+    def __is_expired(response: requests.Response) -> bool:
+        """The site redirects to the login page when the session expires."""
+        return (urlsplit(response.url).path == urlsplit(URL_LOGIN).path
+                or f'id="{xp.username}"' in response.text)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Number of logins, requests, opened and reused connections and
+            the current rate limit.
+        """
+        requests_num, connections = 0, 0
+        pools = self.__adapter.poolmanager.pools
+        for key in pools.keys():
+            requests_num += pools[key].num_requests
+            connections += pools[key].num_connections
+
+        return {
+            'logins': self.__generation,
+            'requests': requests_num,
+            'connections': connections,
+            'reused': requests_num - connections,
+            'rate': self.limiter.stats()['rate']
+        }
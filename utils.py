@@ -1,29 +1,59 @@
+import os
+import re
 from datetime import datetime
+from functools import lru_cache
+from typing import Iterable
+
 from dateutil.relativedelta import relativedelta
 
 
+# Parentheses, the text inside them is removed from the names
+BRACKETS = re.compile(r'[()]')
+
+
+@lru_cache(maxsize=8192)
 def remove_brackets(text: str) -> str:
-    """Remove brackets and text inside"""
-    if any(bracket in ('(', ')') for bracket in text):
-        ret = ''
-        skip1c = 0
-        skip2c = 0
-        for char in text:
-            if char == '(':
-                skip2c += 1
-            elif char == ')' and skip2c > 0:
-                skip2c -= 1
-            elif skip1c == 0 and skip2c == 0:
-                ret += char
-        return ret.strip()
-    return text.strip()
+    """
+    Remove brackets and text inside. Nested brackets are removed as a whole,
+    text after an unclosed bracket is removed too. The same few hundred
+    names come up in every event, so the results are cached.
+    """
+    if '(' not in text:
+        return text.strip()
+
+    parts, depth, start = [], 0, 0
+    for bracket in BRACKETS.finditer(text):
+        if bracket.group() == '(':
+            if depth == 0:
+                parts.append(text[start:bracket.start()])
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                start = bracket.end()
+    if depth == 0:
+        parts.append(text[start:])
+
+    return ''.join(parts).strip()
+
+
+def compile_substrings(substrings: Iterable[str]) -> re.Pattern:
+    """One case insensitive pattern, that matches any of the substrings."""
+    return re.compile('|'.join(map(re.escape, sorted(substrings, key=len, reverse=True))), re.IGNORECASE)
+
+
+def create_parent_dir(path: str) -> None:
+    """Creates the directory of the file, if it doesn't exist."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
 
 
 def validate_dates(start_date: str, final_date: str) -> bool:
     """Check for dates' validity"""
     start = datetime.strptime(start_date, '%d.%m.%Y')
     final = datetime.strptime(final_date, '%d.%m.%Y')
-    return True if final < start else False
+    return start <= final
 
 
 def create_period(start_month: int, start_year: int) -> str:
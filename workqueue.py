@@ -0,0 +1,249 @@
+"""
+Durable queue of the event pages to fetch, shared by the worker processes
+of one or several hosts. Discovery enqueues the codes of a period, workers
+claim pages for a lease, fetch and parse them and push the participants
+back, a single collect step counts the reports of the period from the
+results. Pages of a worker, that crashed, are claimed again, when their
+lease expires. Kept in a single SQLite file. Workers of other hosts open
+it on a shared drive, that supports file locks.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Set, Tuple
+
+from aggregate import empty_listed
+from config import WORKERS, QUEUE_LEASE, QUEUE_ATTEMPTS, QUEUE_POLL
+from constants import QUEUE_PATH
+from metrics import get_metrics
+from period import Period
+from utils import create_parent_dir
+
+if TYPE_CHECKING:
+    from parser import User
+
+# States of a page
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def worker_id() -> str:
+    """Host and process of the worker."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class WorkQueue:
+    def __init__(self, path: str = QUEUE_PATH, lease: float = QUEUE_LEASE, attempts: int = QUEUE_ATTEMPTS):
+        """
+        Args:
+            path: SQLite file with the queue
+            lease: time a worker has to fetch a claimed page, sec
+            attempts: a page, that failed that many times, isn't claimed again
+        """
+        create_parent_dir(path)
+
+        self.lease, self.attempts = lease, attempts
+        self.__lock = threading.Lock()
+        # No WAL, it doesn't work over a network drive. Transactions are short,
+        # the workers wait for each other for up to 60 sec
+        self.__connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self.__connection.executescript(
+            'CREATE TABLE IF NOT EXISTS listed ('
+            'period TEXT, event_type TEXT, action_type TEXT, event_code TEXT, '
+            'PRIMARY KEY (period, event_type, action_type, event_code));'
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'event_code TEXT, event_type TEXT, state TEXT, worker TEXT, leased_until REAL, '
+            'attempts INTEGER DEFAULT 0, result TEXT, error TEXT, PRIMARY KEY (event_code, event_type));'
+            'CREATE INDEX IF NOT EXISTS pages_state ON pages (state, leased_until);'
+        )
+
+    @contextmanager
+    def __transaction(self) -> Iterator[None]:
+        """
+        Takes the write lock of the file at once and commits the block. Rolls
+        it back, if the block fails, so the connection isn't left in the
+        transaction, that holds the lock of every worker.
+        """
+        self.__connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+            self.__connection.execute('COMMIT')
+        except BaseException:
+            if self.__connection.in_transaction:
+                self.__connection.execute('ROLLBACK')
+            raise
+
+    def enqueue(self, period: Period, codes: Iterable[Tuple[str, str, str]], refresh: bool = False) -> int:
+        """
+        Lists the codes of the period and queues their pages. Pages, that
+        are already in the queue, aren't queued again.
+        Args:
+            codes: event type, action type and event code from discovery
+            refresh: queue the pages, that are done or failed, again
+        Returns:
+            Number of listed codes.
+        """
+        codes = list(codes)
+        pages = {(event_code, event_type) for event_type, _, event_code in codes}
+        with self.__lock, self.__transaction():
+            self.__connection.execute('DELETE FROM listed WHERE period = ?', (period.dates,))
+            self.__connection.executemany(
+                'INSERT OR IGNORE INTO listed VALUES (?, ?, ?, ?)',
+                ((period.dates, *code) for code in codes)
+            )
+            self.__connection.executemany(
+                'INSERT OR IGNORE INTO pages (event_code, event_type, state) VALUES (?, ?, ?)',
+                ((*page, PENDING) for page in pages)
+            )
+            if refresh:
+                self.__connection.executemany(
+                    'UPDATE pages SET state = ?, attempts = 0, result = NULL, error = NULL '
+                    'WHERE event_code = ? AND event_type = ? AND state != ?',
+                    ((PENDING, *page, LEASED) for page in pages)
+                )
+
+        return len(codes)
+
+    def claim(self, worker: str, limit: int) -> List[Tuple[str, str]]:
+        """
+        Leases up to limit pending pages and the pages, whose lease expired,
+        to the worker. Expired pages, that ran out of attempts, fail.
+        Returns:
+            Event codes and event types of the pages.
+        """
+        now = time.time()
+        with self.__lock, self.__transaction():
+            self.__connection.execute(
+                'UPDATE pages SET state = ?, error = ? WHERE state = ? AND leased_until < ? AND attempts >= ?',
+                (FAILED, 'lease expired', LEASED, now, self.attempts)
+            )
+            pages = self.__connection.execute(
+                'SELECT event_code, event_type FROM pages '
+                'WHERE state = ? OR (state = ? AND leased_until < ?) LIMIT ?',
+                (PENDING, LEASED, now, limit)
+            ).fetchall()
+            self.__connection.executemany(
+                'UPDATE pages SET state = ?, worker = ?, leased_until = ?, attempts = attempts + 1 '
+                'WHERE event_code = ? AND event_type = ?',
+                ((LEASED, worker, now + self.lease, *page) for page in pages)
+            )
+
+        return pages
+
+    def complete(self, worker: str, event_code: str, event_type: str, feat: Set[str], secure: Set[str]) -> None:
+        """
+        Stores participants of the page. A late result of an expired lease is
+        kept too, unless the page is already done by the worker, that holds
+        the lease now.
+        """
+        result = json.dumps((sorted(feat), sorted(secure)), ensure_ascii=False)
+        with self.__lock:
+            self.__connection.execute(
+                'UPDATE pages SET state = ?, result = ?, error = NULL '
+                'WHERE event_code = ? AND event_type = ? AND (worker = ? OR state != ?)',
+                (DONE, result, event_code, event_type, worker, DONE)
+            )
+
+    def fail(self, worker: str, event_code: str, event_type: str, error: str) -> None:
+        """
+        Queues the page again or fails it, if it ran out of attempts. A late
+        failure of an expired lease doesn't touch the page, another worker
+        might be fetching it.
+        """
+        with self.__lock:
+            self.__connection.execute(
+                'UPDATE pages SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ? '
+                'WHERE event_code = ? AND event_type = ? AND state = ? AND worker = ?',
+                (self.attempts, FAILED, PENDING, error, event_code, event_type, LEASED, worker)
+            )
+
+    def results(self, period: Period
+                ) -> Tuple[Dict[Tuple[str, str], Set[str]], Dict[Tuple[str, str], Tuple[Set[str], Set[str]]]]:
+        """
+        Returns:
+            Listed codes of the period and participants of the pages, that
+            are done. Pages, that aren't done, are missing.
+        """
+        listed = empty_listed()
+        with self.__lock:
+            rows = self.__connection.execute(
+                'SELECT event_type, action_type, event_code FROM listed WHERE period = ?', (period.dates,)
+            ).fetchall()
+            done = self.__connection.execute(
+                'SELECT event_code, event_type, result FROM pages p '
+                'WHERE state = ? AND EXISTS (SELECT 1 FROM listed l WHERE l.event_code = p.event_code AND l.event_type = p.event_type AND l.period = ?)',
+                (DONE, period.dates)
+            ).fetchall()
+        for event_type, action_type, event_code in rows:
+            listed[(event_type, action_type)].add(event_code)
+        pages = {}
+        for event_code, event_type, result in done:
+            feat, secure = json.loads(result)
+            pages[(event_code, event_type)] = set(feat), set(secure)
+
+        return listed, pages
+
+    def stats(self, period: Period = None) -> Dict[str, int]:
+        """
+        Returns:
+            Number of pages in every state, of the period, if it's set.
+        """
+        with self.__lock:
+            if period is None:
+                rows = self.__connection.execute('SELECT state, COUNT(*) FROM pages GROUP BY state').fetchall()
+            else:
+                rows = self.__connection.execute(
+                    'SELECT state, COUNT(*) FROM pages p WHERE EXISTS (SELECT 1 FROM listed l '
+                    'WHERE l.event_code = p.event_code AND l.event_type = p.event_type AND l.period = ?) '
+                    'GROUP BY state', (period.dates,)
+                ).fetchall()
+
+        return {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+
+def work(queue: WorkQueue, user: 'User', workers: int = WORKERS, follow: bool = False) -> int:
+    """
+    Claims pages from the queue, parses them in a pool of workers threads
+    and pushes the participants back. A new page is claimed as soon as a
+    thread is free.
+    Args:
+        follow: wait for new pages, when the queue is empty, instead of
+            returning
+    Returns:
+        Number of pages done by the worker.
+    """
+    worker, done = worker_id(), 0
+    futures: Dict[Future, Tuple[str, str]] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            if len(futures) < workers:
+                for event_code, event_type in queue.claim(worker, workers - len(futures)):
+                    futures[executor.submit(user.parse_page, event_code, event_type)] = event_code, event_type
+            if not futures:
+                if not follow:
+                    break
+                time.sleep(QUEUE_POLL)
+                continue
+
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                event_code, event_type = futures.pop(future)
+                try:
+                    queue.complete(worker, event_code, event_type, *future.result())
+                    done += 1
+                except Exception as error:
+                    logging.warning(f'{event_type} event {event_code} failed: {error!r}')
+                    get_metrics().count('failed_pages')
+                    queue.fail(worker, event_code, event_type, repr(error))
+
+    logging.info(f'Worker {worker}: {done} pages done')
+    return done
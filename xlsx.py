@@ -0,0 +1,148 @@
+"""
+Writer of the xls reports straight into the xlsx parts of the template. The
+template is read once, every report reuses its styles, shared strings and
+sheet layout, only the rows of the sheet are formatted anew. It's several
+times faster than filling a copy of the template through openpyxl, that
+builds an object for every cell of the sheet and serializes them one by one.
+"""
+
+import re
+import zipfile
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+# Parts of the template, that are written anew for every workbook
+WORKBOOK = 'xl/workbook.xml'
+WORKBOOK_RELS = 'xl/_rels/workbook.xml.rels'
+CONTENT_TYPES = '[Content_Types].xml'
+# The template has one sheet
+SHEET = 'xl/worksheets/sheet1.xml'
+# Sheet relationships and drawings aren't copied, the drawing of the
+# template is empty and a drawing can't be shared by several sheets
+SKIPPED = re.compile(r'xl/worksheets/_rels/.*|xl/drawings/.*')
+
+SHEET_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+SHEET_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+
+ROW = re.compile(r'<row r="(\d+)"([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+CELL = re.compile(r'<c r="([A-Z]+)\d+"(?: s="(\d+)")?[^>]*?(?:/>|>.*?</c>)', re.S)
+
+# Columns of a report row: name, 4 counters and the sum of the performances
+DATA_COLUMNS = ('A', 'B', 'C', 'D', 'E', 'F')
+
+
+class Template:
+    def __init__(self, path: str, start_row: int):
+        """
+        Args:
+            path: xlsx file with the template on its only sheet
+            start_row: first row of the data, its styles go to the rows of
+                the data below the template
+        """
+        with zipfile.ZipFile(path) as archive:
+            self.parts = {name: archive.read(name) for name in archive.namelist() if not SKIPPED.fullmatch(name)}
+
+        sheet = self.parts.pop(SHEET).decode('utf-8')
+        head, rest = sheet.split('<sheetData>', 1)
+        data, tail = rest.split('</sheetData>', 1)
+        self.head, self.tail = head, re.sub(r'<drawing [^>]*/>', '', tail)
+        self.start_row = start_row
+
+        # Row -> attributes and cells of the row: column -> style and cell
+        self.rows: Dict[int, Tuple[str, Dict[str, Tuple[str, str]]]] = {}
+        for row, attributes, cells in ROW.findall(data):
+            self.rows[int(row)] = attributes, {
+                cell.group(1): (cell.group(2) or '0', cell.group()) for cell in CELL.finditer(cells)
+            }
+
+    def __data_row(self, row_index: int, row: List) -> str:
+        """Name, numeric counters and the formula in the styles of the template."""
+        attributes, cells = self.rows.get(row_index, self.rows[self.start_row])
+        styles = self.rows[self.start_row][1]
+        style = {column: cells.get(column, styles.get(column, ('0', '')))[0] for column in DATA_COLUMNS}
+        return (
+            f'<row r="{row_index}"{attributes}>'
+            f'<c r="A{row_index}" s="{style["A"]}" t="inlineStr"><is><t>{escape(str(row[0]))}</t></is></c>'
+            + ''.join(
+                f'<c r="{column}{row_index}" s="{style[column]}"><v>{int(value)}</v></c>'
+                for column, value in zip(DATA_COLUMNS[1:5], row[1:])
+            )
+            + f'<c r="F{row_index}" s="{style["F"]}"><f>B{row_index}+C{row_index}</f></c>'
+            + ''.join(cell for column, (_, cell) in cells.items() if column not in DATA_COLUMNS)
+            + '</row>'
+        )
+
+    def __template_row(self, row_index: int, title: str = None) -> str:
+        """
+        Row of the template. Below the start row the formulas of the sum are
+        cleared, they are the shared formulas of the rows of the data.
+        """
+        attributes, cells = self.rows[row_index]
+        parts = []
+        for column, (style, cell) in cells.items():
+            if title is not None and column == 'A':
+                cell = f'<c r="A{row_index}" s="{style}" t="inlineStr"><is><t>{escape(title)}</t></is></c>'
+            elif row_index >= self.start_row and column == 'F':
+                cell = f'<c r="F{row_index}" s="{style}"/>'
+            parts.append(cell)
+
+        return f'<row r="{row_index}"{attributes}>{"".join(parts)}</row>' if parts else \
+            f'<row r="{row_index}"{attributes}/>'
+
+    def sheet(self, title: str, rows: List[List]) -> bytes:
+        """
+        Args:
+            title: text of the first cell, e.g. the dates of the period
+            rows: name and 4 counters
+        Returns:
+            Sheet of the template with the rows from the start row on.
+        """
+        last_row = max(max(self.rows), self.start_row + len(rows) - 1)
+        parts = [self.head, '<sheetData>']
+        for row_index in range(1, last_row + 1):
+            if self.start_row <= row_index < self.start_row + len(rows):
+                parts.append(self.__data_row(row_index, rows[row_index - self.start_row]))
+            elif row_index in self.rows:
+                parts.append(self.__template_row(row_index, title if row_index == 1 else None))
+        parts += ['</sheetData>', self.tail]
+
+        return ''.join(parts).encode('utf-8')
+
+    def save(self, file_name: str, sheets: List[Tuple[str, bytes]]) -> None:
+        """
+        Writes the sheets to a workbook with the styles and the shared
+        strings of the template. Excel computes the formulas on load.
+        Args:
+            sheets: name and sheet() of every sheet
+        """
+        workbook = self.parts[WORKBOOK].decode('utf-8')
+        workbook = re.sub(r'<sheets>.*?</sheets>', '<sheets>' + ''.join(
+            f'<sheet state="visible" name={quoteattr(name)} sheetId="{index}" r:id="rIdSheet{index}"/>'
+            for index, (name, _) in enumerate(sheets, start=1)
+        ) + '</sheets>', workbook, flags=re.S)
+        workbook = re.sub(r'<calcPr[^>]*/>', '<calcPr fullCalcOnLoad="1"/>', workbook)
+
+        relationships = re.sub(
+            rf'<Relationship [^>]*Type="{SHEET_REL_TYPE}"[^>]*/>', '', self.parts[WORKBOOK_RELS].decode('utf-8')
+        ).replace('</Relationships>', ''.join(
+            f'<Relationship Id="rIdSheet{index}" Type="{SHEET_REL_TYPE}" Target="worksheets/sheet{index}.xml"/>'
+            for index in range(1, len(sheets) + 1)
+        ) + '</Relationships>')
+
+        content_types = re.sub(
+            r'<Override [^>]*PartName="/xl/(?:worksheets|drawings)/[^"]*"[^>]*/>', '',
+            self.parts[CONTENT_TYPES].decode('utf-8')
+        ).replace('</Types>', ''.join(
+            f'<Override ContentType="{SHEET_TYPE}" PartName="/xl/worksheets/sheet{index}.xml"/>'
+            for index in range(1, len(sheets) + 1)
+        ) + '</Types>')
+
+        with zipfile.ZipFile(file_name, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(CONTENT_TYPES, content_types)
+            for name, part in self.parts.items():
+                if name not in (CONTENT_TYPES, WORKBOOK, WORKBOOK_RELS):
+                    archive.writestr(name, part)
+            archive.writestr(WORKBOOK, workbook)
+            archive.writestr(WORKBOOK_RELS, relationships)
+            for index, (_, sheet) in enumerate(sheets, start=1):
+                archive.writestr(f'xl/worksheets/sheet{index}.xml', sheet)